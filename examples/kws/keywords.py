@@ -8,11 +8,19 @@
 # ///
 
 import argparse
+import hashlib
+import json
+import os
 from pathlib import Path
-from typing import List, Union
+from typing import Dict, List, Optional, Union
+
+import pypinyin
 from pypinyin import pinyin
 from pypinyin.contrib.tone_convert import to_initials, to_finals_tone
 
+# 缓存格式变化时加 1，旧的缓存会自动失效
+CACHE_VERSION = 1
+
 
 def get_args():
     parser = argparse.ArgumentParser()
@@ -70,15 +78,26 @@ def get_args():
         help="Path where the encoded tokens will be written to.",
     )
 
+    parser.add_argument(
+        "--cache",
+        type=str,
+        required=False,
+        default="keywords.cache.json",
+        help="""Path to the tokenization cache. The token table and the encoded
+        result of each phrase are saved here, so only new or changed phrases are
+        processed next time. Pass an empty string to disable the cache.""",
+    )
+
     return parser.parse_args()
 
 
-def text2token(
-    texts: List[str],
-    tokens: str,
-    output_ids: bool = False,
-):
-    """将文本转换为 token 列表"""
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_tokens(tokens: str) -> Dict[str, int]:
+    """读取并校验 tokens.txt"""
     assert Path(tokens).is_file(), f"File not exists, {tokens}"
     tokens_table = {}
     with open(tokens, "r", encoding="utf-8") as f:
@@ -87,75 +106,186 @@ def text2token(
             assert len(toks) == 2, len(toks)
             assert toks[0] not in tokens_table, f"Duplicate token: {toks} "
             tokens_table[toks[0]] = int(toks[1])
+    return tokens_table
 
-    texts_list: List[List[str]] = []
-    for txt in texts:
-        res = []
-        py = [x[0] for x in pinyin(txt)]
-        for x in py:
-            initial = to_initials(x, strict=False)
-            final = to_finals_tone(x, strict=False)
-            if initial == "" and final == "":
-                res.append(x)
-            else:
-                if initial != "":
-                    res.append(initial)
-                if final != "":
-                    res.append(final)
-        texts_list.append(res)
 
-    result: List[List[Union[int, str]]] = []
-    for text in texts_list:
-        text_list = []
-        contain_oov = False
-        for txt in text:
-            if txt in tokens_table:
-                text_list.append(tokens_table[txt] if output_ids else txt)
-            else:
+def to_pinyin(text: str) -> List[str]:
+    """将文本转换为声母、韵母列表"""
+    res = []
+    py = [x[0] for x in pinyin(text)]
+    for x in py:
+        initial = to_initials(x, strict=False)
+        final = to_finals_tone(x, strict=False)
+        if initial == "" and final == "":
+            res.append(x)
+        else:
+            if initial != "":
+                res.append(initial)
+            if final != "":
+                res.append(final)
+    return res
+
+
+class KeywordCache:
+    """
+    唤醒词编码缓存
+
+    校验过的 token 表和每个短语的拼音结果保存在一个 JSON 文件中，
+    按 tokens.txt 的哈希和 pypinyin 的版本区分，任意一个变了缓存就全部失效。
+    重新生成 keywords.txt 时只有新增或修改过的短语需要重新转换拼音。
+    """
+
+    def __init__(self, tokens: str, path: Optional[str] = None):
+        """
+        参数:
+            tokens: tokens.txt 的路径
+            path: 缓存文件的路径，None 表示只在内存中缓存
+        """
+        assert Path(tokens).is_file(), f"File not exists, {tokens}"
+        self.tokens = tokens
+        self.path = path
+        self.key = f"{CACHE_VERSION}|{pypinyin.__version__}|{file_hash(tokens)}"
+        self.tokens_table: Optional[Dict[str, int]] = None
+        self.phrases: Dict[str, List[str]] = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if data.get("key") != self.key:
+            return
+        self.tokens_table = data.get("tokens")
+        self.phrases = data.get("phrases", {})
+
+    def save(self):
+        """有新的编码结果时写回缓存文件"""
+        if not self.path or not self._dirty:
+            return
+        data = {
+            "key": self.key,
+            "tokens": self.get_tokens_table(),
+            "phrases": self.phrases,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def get_tokens_table(self) -> Dict[str, int]:
+        if self.tokens_table is None:
+            self.tokens_table = load_tokens(self.tokens)
+            self._dirty = True
+        return self.tokens_table
+
+    def pinyin(self, text: str) -> List[str]:
+        if text not in self.phrases:
+            self.phrases[text] = to_pinyin(text)
+            self._dirty = True
+        return self.phrases[text]
+
+    def encode(
+        self, text: str, output_ids: bool = False
+    ) -> Optional[List[Union[int, str]]]:
+        """编码一个短语，包含 token 表中没有的 token 时返回 None"""
+        tokens_table = self.get_tokens_table()
+        pieces = self.pinyin(text)
+        for piece in pieces:
+            if piece not in tokens_table:
                 print(
-                    f"Can't find token {txt} in token table, check your "
-                    f"tokens.txt see if {txt} in it. skipping text : {text}."
+                    f"Can't find token {piece} in token table, check your "
+                    f"tokens.txt see if {piece} in it. skipping text : {pieces}."
                 )
-                contain_oov = True
-                break
-        if contain_oov:
+                return None
+        if output_ids:
+            return [tokens_table[piece] for piece in pieces]
+        return list(pieces)
+
+
+def text2token(
+    texts: List[str],
+    tokens: str,
+    output_ids: bool = False,
+    cache: Optional[KeywordCache] = None,
+):
+    """将文本转换为 token 列表（包含未知 token 的文本会被跳过）"""
+    cache = cache or KeywordCache(tokens)
+    result: List[List[Union[int, str]]] = []
+    for txt in texts:
+        encoded = cache.encode(txt, output_ids)
+        if encoded is not None:
+            result.append(encoded)
+    return result
+
+
+def parse_keyword(line: str):
+    """
+    解析 my-keywords.txt 中的一行，返回 (短语, 额外信息)
+
+    额外信息：boost（: 开头）、触发阈值（# 开头）、原始短语（@ 开头）
+    """
+    extra = []
+    text = []
+    toks = line.strip().split()
+    if len(toks) == 1:
+        text.append(toks[0])
+        extra.append("@" + toks[0])
+    else:
+        for tok in toks:
+            if tok[0] == ":" or tok[0] == "#" or tok[0] == "@":
+                extra.append(tok)
+            else:
+                text.append(tok)
+    return " ".join(text), extra
+
+
+def compile_keywords(
+    lines: List[str],
+    tokens: str = "tokens.txt",
+    cache_path: Optional[str] = "keywords.cache.json",
+) -> List[str]:
+    """
+    把 my-keywords.txt 格式的唤醒词编码为 keywords.txt 格式的行
+
+    使用持久化缓存，只转换新增或修改过的短语；可以在其他程序中直接调用，
+    比如运行中的唤醒服务更新唤醒词时。包含未知 token 的唤醒词会被跳过。
+    """
+    cache = KeywordCache(tokens, cache_path)
+    result = []
+    for line in lines:
+        if not line.strip():
             continue
-        else:
-            result.append(text_list)
+        text, extra = parse_keyword(line)
+        encoded = cache.encode(text)
+        if encoded is not None:
+            result.append(" ".join(encoded + extra))
+    try:
+        cache.save()
+    except OSError as e:
+        # 缓存只影响下次生成的速度，保存失败不影响结果
+        print(f"⚠️ 无法保存唤醒词缓存 {cache.path}: {e}")
     return result
 
 
 def main() -> None:
     args = get_args()
 
-    texts = []
-    # extra information like boosting score (start with :), triggering threshold (start with #)
-    # original keyword (start with @)
-    extra_info = []
     with open(args.text, "r", encoding="utf8") as f:
-        for line in f:
-            extra = []
-            text = []
-            toks = line.strip().split()
-            if len(toks) == 1:
-                text.append(toks[0])
-                extra.append('@'+toks[0])
-            else:
-                for tok in toks:
-                    if tok[0] == ":" or tok[0] == "#" or tok[0] == "@":
-                        extra.append(tok)
-                    else:
-                        text.append(tok)
-            texts.append(" ".join(text))
-            extra_info.append(extra)
-    encoded_texts = text2token(
-        texts,
+        lines = f.readlines()
+    encoded_lines = compile_keywords(
+        lines,
         tokens=args.tokens,
+        cache_path=args.cache or None,
     )
     with open(args.output, "w", encoding="utf8") as f:
-        for i, txt in enumerate(encoded_texts):
-            txt += extra_info[i]
-            f.write(" ".join(txt) + "\n")
+        for line in encoded_lines:
+            f.write(line + "\n")
     print(f"✅ 唤醒词已保存到 {args.output}")
 
 
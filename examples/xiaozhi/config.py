@@ -77,6 +77,137 @@ APP_CONFIG = {
         "min_speech_duration": 250,
         # 最小静默时长（ms）
         "min_silence_duration": 500,
+        # 流式模式：检测到语音后立即边检测边上传，不再暂停/恢复 VAD（减少吞字和延迟）
+        "streaming": False,
+        "endpoint": {
+            # 自适应断句：根据语音概率趋势、说话时长（和可选的尾部上下文模型）提前结束聆听
+            "enabled": False,
+            # 最短静默时长（ms），最长为 min_silence_duration
+            "min_silence": 200,
+            # 超过该时长（ms）的语音视为完整的长句，静默等待更短
+            "long_utterance": 3000,
+            # （可选）尾部上下文模型：输入最近 1s 的 int16 音频，返回这句话已经说完的概率
+            "model": None,
+        },
+    },
+    "agc": {
+        # 是否开启自动增益（开启后 vad.boost 作为初始增益）
+        "enabled": False,
+        # 目标音量（dBFS）
+        "target_level": -20,
+        # 环境噪音音量（dBFS，放大前），低于该值时不调整增益
+        "noise_floor": -65,
+        # 增益范围（倍数）
+        "min_gain": 1,
+        "max_gain": 30,
+        # 增益下降/上升的时间常数（秒）
+        "attack": 0.02,
+        "release": 0.5,
+    },
+    "frontend": {
+        # KWS 和 VAD 共用一个录音流和检测线程，音频只转换一次
+        "enabled": False,
+        # 语音概率达到该值时才运行唤醒词模型，0 表示一直运行
+        "kws_threshold": 0.3,
+        # 检测到语音时，先补上之前多长时间的音频（ms）
+        "kws_preroll": 300,
+        # 语音结束后唤醒词模型继续运行的时长（ms）
+        "kws_hangover": 500,
+    },
+    "gate": {
+        # 能量门限：跳过明显低于环境噪音的音频，不送入 VAD / KWS 模型（节省空闲时的 CPU）
+        "enabled": False,
+        # 高于环境噪音多少分贝时才送入模型（dB）
+        "margin": 6,
+        # 最低门限（dBFS，放大后）
+        "min_level": -60,
+        # 音量接近门限时允许的最大过零率（0-1），超过视为嘶嘶声等宽带噪音
+        "max_zero_crossing_rate": 0.35,
+        # 有声音后继续送入模型的拖尾时长（ms）
+        "hangover": 300,
+        # 门限打开时，先补上之前多长时间的音频送入 KWS（ms）
+        "preroll": 300,
+    },
+    "stream": {
+        # 每路录音缓冲区的最大时长（秒）
+        "buffer_duration": 5,
+        # 缓冲区溢出策略：drop_oldest 丢弃最早的音频，drop_all 清空积压只保留最新音频
+        "overflow": "drop_oldest",
+    },
+    "opus": {
+        # 上行语音的 Opus 编码参数
+        # 编码模式：voip（针对语音优化）、audio、lowdelay
+        "application": "voip",
+        # 码率（bps），None 表示自动
+        "bitrate": 24000,
+        # 编码复杂度（0-10），性能较弱的设备可以调低
+        "complexity": 5,
+        # 静音时不连续发送（DTX），节省带宽
+        "dtx": True,
+        # 带内前向纠错
+        "inband_fec": False,
+        # 每帧时长（ms）：20、40、60
+        "frame_duration": 60,
+    },
+    "connection": {
+        # 断线重连：第一次重试最多等待 backoff_base 秒，之后指数增长到 backoff_max 秒
+        "backoff_base": 0.5,
+        "backoff_max": 30,
+        # TCP keepalive 的空闲时长（秒），0 表示不开启
+        "keepalive": 30,
+        # DNS 缓存时长（秒）
+        "dns_ttl": 300,
+        # 保持一个已经握手的备用连接，断线后重连时不用等待建立连接
+        # 备用连接使用相同的 Device-Id，部分服务端会因此断开当前连接，默认关闭
+        "prewarm": False,
+        # 备用连接被关闭后，至少等待多久再重新预热（秒）
+        "prewarm_interval": 5,
+    },
+    "trace": {
+        # 记录每次对话从唤醒到收到回复的各环节耗时
+        "enabled": False,
+        # 每次对话输出一行 JSON 到该文件，None 表示只在内存中统计
+        "path": None,
+        # 直方图中每个步骤最多保留多少个样本
+        "max_samples": 1000,
+        # 最多保留多少个 session，延迟到达的步骤仍然可以记到对应的 session
+        "max_sessions": 10,
+    },
+    "uplink": {
+        # 上行音频发送队列最多积压多少音频（ms），网络阻塞时丢弃最早的音频
+        "max_buffer": 1000,
+    },
+    "jitter": {
+        # 下行音频开始播放前的缓冲时长（ms），网络抖动时会自动加大
+        "target_delay": 120,
+        # 自适应缓冲时长的上限（ms）
+        "max_delay": 480,
+        # 缓冲区最多保存多少音频（ms）
+        "max_buffer": 5000,
+        # 连续丢失多少帧后认为音频已经播完
+        "max_concealed": 2,
+    },
+    "output": {
+        # 扬声器的输出采样率（与服务端下行音频的采样率不同时会自动重采样）
+        "sample_rate": 24000,
+        # 是否使用服务端 hello 消息中协商的下行音频参数（采样率、帧时长）
+        "use_server_audio_params": True,
+        # 最多比实时播放提前发送多少音频（ms）
+        "lead": 300,
+        # 每次至少合并多少音频再发送（ms）
+        "chunk": 120,
+        # 设备端剩余的音频少于该值时立即发送（ms）
+        "min_lead": 40,
+        # 最多积压多少音频（ms），超出时丢弃最早的音频
+        "max_buffer": 1000,
+        # 写入的音频已经由抖动缓冲区按实时速度输出，不再攒块等待，只限制提前量
+        "paced": True,
+    },
+    "runtime": {
+        # 单事件循环模式：录音、VAD、KWS、编码和发送全部运行在同一个事件循环上（仅小爱音箱模式）
+        "single_loop": False,
+        # 模型推理线程数
+        "inference_workers": 1,
     },
     "xiaozhi": {
         "OTA_URL": "https://api.tenclass.net/xiaozhi/ota/",
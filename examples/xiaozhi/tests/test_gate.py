@@ -0,0 +1,29 @@
+import numpy as np
+
+from xiaozhi.services.audio.gate import EnergyGate
+
+WINDOW = 512
+
+
+def tone(num_windows, amplitude):
+    t = np.arange(num_windows * WINDOW) / 16000
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16).tobytes()
+
+
+def test_metrics_count_whole_chunks():
+    gate = EnergyGate(enabled=True, hangover=0)
+    silence = np.zeros(4 * WINDOW, dtype=np.int16).tobytes()
+    assert not gate.is_open(silence, WINDOW)
+    assert gate.skipped == 4 and gate.evaluated == 0
+
+    # 只有最后一个窗口有声音，整块都会送入模型，全部计入 evaluated
+    assert gate.is_open(silence[: 3 * WINDOW * 2] + tone(1, 8000), WINDOW)
+    assert gate.evaluated == 4 and gate.skipped == 4
+    assert gate.stats()["skip_ratio"] == 0.5
+
+
+def test_disabled_gate_is_always_open():
+    gate = EnergyGate(enabled=False)
+    silence = np.zeros(3 * WINDOW, dtype=np.int16).tobytes()
+    assert gate.is_open(silence, WINDOW)
+    assert gate.evaluated == 3 and gate.skipped == 0
@@ -0,0 +1,196 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+try:
+    import opuslib_next as opuslib
+except Exception:
+    pytest.skip("找不到 Opus 库", allow_module_level=True)
+
+from xiaozhi.services.audio.jitter import JitterBuffer
+
+SAMPLE_RATE = 16000
+FRAME_DURATION = 20
+FRAME_SIZE = SAMPLE_RATE * FRAME_DURATION // 1000
+
+
+def create_buffer(**kwargs):
+    played = []
+    buffer = JitterBuffer(
+        opuslib.Decoder(SAMPLE_RATE, 1),
+        FRAME_SIZE,
+        FRAME_DURATION,
+        on_pcm=played.append,
+        **kwargs,
+    )
+    return buffer, played
+
+
+def opus_packets(count, fec=False):
+    """每帧频率不同的正弦波，帧顺序不同时解码结果也不同"""
+    encoder = opuslib.Encoder(SAMPLE_RATE, 1, opuslib.APPLICATION_VOIP)
+    if fec:
+        encoder.inband_fec = True
+        encoder.packet_loss_perc = 20
+    t = np.arange(FRAME_SIZE) / SAMPLE_RATE
+    packets = []
+    for idx in range(count):
+        pcm = np.sin(2 * np.pi * (300 + 50 * idx) * t) * 8000
+        packets.append(encoder.encode(pcm.astype(np.int16).tobytes(), FRAME_SIZE))
+    return packets
+
+
+def decode_all(packets):
+    decoder = opuslib.Decoder(SAMPLE_RATE, 1)
+    return [decoder.decode(packet, FRAME_SIZE, False) for packet in packets]
+
+
+def play(buffer, packets):
+    """按 {seq: packet} 全部写入后再开始播放，等待播放结束"""
+    for seq, packet in packets.items():
+        buffer.push(packet, seq)
+    buffer.start()
+    try:
+        assert buffer.drain(timeout=2)
+    finally:
+        buffer.stop()
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_packets_are_played_in_seq_order():
+    buffer, played = create_buffer(target_delay=80)
+    packets = opus_packets(4)
+    play(buffer, {seq: packets[seq] for seq in (2, 0, 3, 1)})
+
+    assert played[:4] == decode_all(packets)
+    assert buffer.metrics["played"] == 4
+    assert buffer.metrics["recovered"] == 0
+
+
+def test_late_and_duplicate_packets_are_dropped():
+    buffer, played = create_buffer(target_delay=100)
+    packets = opus_packets(8)
+    for seq in range(5):
+        buffer.push(packets[seq], seq)
+    # 缓冲中的重复包只保留一份
+    buffer.push(packets[1], 1)
+    buffer.start()
+    try:
+        assert wait_until(lambda: buffer.metrics["played"] >= 3)
+        # 已经播放过的序号迟到了
+        buffer.push(packets[0], 0)
+        for seq in range(5, 8):
+            buffer.push(packets[seq], seq)
+        assert buffer.drain()
+    finally:
+        buffer.stop()
+
+    assert buffer.metrics["late"] == 1
+    assert buffer.metrics["played"] == 8
+    assert played[:8] == decode_all(packets)
+
+
+def test_missing_frame_is_recovered_from_next_packet():
+    buffer, played = create_buffer(target_delay=80)
+    packets = opus_packets(5, fec=True)
+    play(buffer, {seq: packets[seq] for seq in (0, 1, 3, 4)})
+
+    assert buffer.metrics["played"] == 4
+    assert buffer.metrics["recovered"] == 1
+    # 结尾补偿 max_concealed 帧后停止播放
+    assert buffer.metrics["concealed"] == buffer.max_concealed
+    assert all(len(pcm) == FRAME_SIZE * 2 for pcm in played)
+    assert len(played) == 5 + buffer.max_concealed
+
+
+def test_gap_is_concealed_and_raises_target_depth():
+    buffer, played = create_buffer(target_delay=100, max_concealed=3)
+    packets = opus_packets(8)
+    # 3、4 用 PLC 补偿，5 用 6 携带的 FEC 数据恢复
+    play(buffer, {seq: packets[seq] for seq in (0, 1, 2, 6, 7)})
+
+    assert buffer.metrics["played"] == 5
+    assert buffer.metrics["concealed"] == 2 + buffer.max_concealed
+    assert buffer.metrics["recovered"] == 1
+    assert buffer.metrics["underruns"] == 1
+    assert buffer.target_depth == buffer.min_depth + 1
+    assert len(played) == 8 + buffer.max_concealed
+
+
+def test_target_depth_shrinks_after_stable_playout():
+    depths = []
+    buffer = JitterBuffer(
+        opuslib.Decoder(SAMPLE_RATE, 1),
+        FRAME_SIZE,
+        FRAME_DURATION,
+        on_pcm=lambda pcm: depths.append(buffer.target_depth),
+        target_delay=40,
+        stable_frames=4,
+    )
+    packets = opus_packets(9)
+    play(buffer, {seq: packets[seq] for seq in range(9) if seq != 2})
+
+    assert buffer.metrics["underruns"] == 1
+    assert max(depths) == buffer.min_depth + 1
+    # 欠载之后连续 4 帧正常播放，缓冲深度恢复
+    assert buffer.target_depth == buffer.min_depth
+
+
+def test_clear_while_priming_keeps_playout_thread_alive():
+    buffer, played = create_buffer(target_delay=200)
+    buffer.start()
+    try:
+        packets = opus_packets(6)
+        # 不足目标深度，播放线程在等待更多数据时被 clear
+        buffer.push(packets[0])
+        time.sleep(0.05)
+        buffer.clear()
+        time.sleep(0.3)
+        assert buffer.thread.is_alive()
+
+        for packet in packets[1:]:
+            buffer.push(packet)
+        assert wait_until(lambda: buffer.metrics["played"] == 5)
+        assert len(played) >= 5
+    finally:
+        buffer.stop()
+
+
+def test_drain_waits_for_buffered_audio():
+    buffer, played = create_buffer(target_delay=100)
+    buffer.start()
+    try:
+        for packet in opus_packets(10):
+            buffer.push(packet)
+        start = time.monotonic()
+        assert buffer.drain()
+        # 10 帧 20ms 的音频，提前一帧写入
+        assert time.monotonic() - start >= 0.15
+        assert buffer.metrics["played"] == 10
+        assert buffer.depth == 0 and not buffer.playing
+    finally:
+        buffer.stop()
+
+
+def test_drain_returns_when_cleared():
+    buffer, _ = create_buffer(target_delay=100)
+    buffer.start()
+    try:
+        for packet in opus_packets(50):
+            buffer.push(packet)
+        threading.Timer(0.05, buffer.clear).start()
+        start = time.monotonic()
+        assert buffer.drain(timeout=2)
+        assert time.monotonic() - start < 0.5
+    finally:
+        buffer.stop()
@@ -0,0 +1,71 @@
+import pytest
+
+pytest.importorskip("sherpa_onnx")
+spm = pytest.importorskip("sentencepiece")
+
+from sherpa_onnx import text2token
+
+from xiaozhi.services.audio.kws.keywords import KeywordCache, compile_keywords
+
+CJK_CHARS = "你好小智爱同学"
+PHRASES = ["你好小智", "HELLO 小智", "小爱同学 HEY JARVIS", "HEY小智WORLD"]
+
+
+@pytest.fixture
+def model(tmp_path):
+    """用英文语料训练一个很小的 bpe 模型，token 表 = bpe 的 piece + 中文字符"""
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text(
+        "\n".join(["HELLO WORLD", "HEY JARVIS", "HELLO JARVIS", "WORLD HEY"] * 20)
+    )
+    prefix = tmp_path / "bpe"
+    spm.SentencePieceTrainer.train(
+        input=str(corpus),
+        model_prefix=str(prefix),
+        model_type="bpe",
+        vocab_size=30,
+        character_coverage=1.0,
+    )
+    bpe_model = f"{prefix}.model"
+    sp = spm.SentencePieceProcessor(model_file=bpe_model)
+    pieces = [sp.id_to_piece(idx) for idx in range(sp.get_piece_size())]
+    tokens = tmp_path / "tokens.txt"
+    tokens.write_text(
+        "".join(f"{token} {idx}\n" for idx, token in enumerate(pieces + [*CJK_CHARS]))
+    )
+    return str(tokens), bpe_model
+
+
+def test_encode_matches_text2token(model, tmp_path):
+    tokens, bpe_model = model
+    cache = KeywordCache(tokens, bpe_model=bpe_model, path=str(tmp_path / "c.json"))
+    expected = text2token(
+        PHRASES, tokens=tokens, tokens_type="cjkchar+bpe", bpe_model=bpe_model
+    )
+    assert cache.encode(PHRASES) == [list(tokens) for tokens in expected]
+    # 不在 token 表中的字符
+    assert cache.encode(["你好小宝"]) == [None]
+
+
+def test_cache_is_invalidated_when_tokens_change(model, tmp_path):
+    tokens, bpe_model = model
+    cache_path = str(tmp_path / "c.json")
+    assert compile_keywords(
+        ["小智"], tokens, bpe_model=bpe_model, cache_path=cache_path
+    )
+
+    cache = KeywordCache(tokens, bpe_model=bpe_model, path=cache_path)
+    assert "小智" in cache.phrases
+
+    # token 表中去掉 "智" 之后，缓存中的编码结果不能再用
+    with open(tokens, encoding="utf8") as f:
+        lines = [line for line in f if not line.startswith("智 ")]
+    with open(tokens, "w", encoding="utf8") as f:
+        f.writelines(lines)
+    cache = KeywordCache(tokens, bpe_model=bpe_model, path=cache_path)
+    assert cache.phrases == {}
+    assert cache.encode(["小智"]) == [None]
+    assert (
+        compile_keywords(["小智"], tokens, bpe_model=bpe_model, cache_path=cache_path)
+        == []
+    )
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+from xiaozhi.services.audio.output import OutputScheduler
+
+SAMPLE_RATE = 16000
+
+
+def frame(ms):
+    return bytes(SAMPLE_RATE * 2 * ms // 1000)
+
+
+async def run_scheduler(writes, paced, send=None):
+    """按实时速度写入 writes 个 20ms 的帧，返回 (调度器, 每次发送距离开始写入的时间)"""
+    sent = []
+
+    async def default_send(data):
+        sent.append(time.monotonic())
+
+    loop = asyncio.get_running_loop()
+    scheduler = OutputScheduler(
+        send or default_send, loop, sample_rate=SAMPLE_RATE, paced=paced
+    )
+    await asyncio.sleep(0)
+    start = time.monotonic()
+    for _ in range(writes):
+        scheduler.write(frame(20))
+        await asyncio.sleep(0.02)
+    await asyncio.sleep(0.2)
+    scheduler.task.cancel()
+    return scheduler, [t - start for t in sent]
+
+
+def test_paced_source_is_sent_without_extra_delay():
+    scheduler, sent = asyncio.run(run_scheduler(5, paced=True))
+    assert scheduler.metrics["sends"] == 5
+    assert sent[0] < 0.01
+
+    # 未按实时速度写入时先攒块再发送
+    scheduler, sent = asyncio.run(run_scheduler(5, paced=False))
+    assert scheduler.metrics["sends"] < 5
+    assert sent[0] >= 0.1
+
+
+def test_send_errors_are_counted():
+    async def send(data):
+        raise ConnectionError()
+
+    scheduler, _ = asyncio.run(run_scheduler(3, paced=True, send=send))
+    assert scheduler.stats()["send_errors"] == 3
+    assert scheduler.metrics["sends"] == 0
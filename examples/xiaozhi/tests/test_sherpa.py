@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("sherpa_onnx")
+
+from xiaozhi.services.audio.kws.sherpa import (
+    _SherpaOnnx,
+    format_keyword,
+    keyword_names,
+)
+
+
+def test_format_keyword_adds_defaults():
+    line = format_keyword("n ǐ h ǎo @你好", boost=1.5, threshold=0.2)
+    assert line == "n ǐ h ǎo :1.5 #0.2 @你好"
+    assert format_keyword("n ǐ h ǎo") == "n ǐ h ǎo"
+
+
+def test_format_keyword_keeps_inline_options():
+    line = "#0.3 n ǐ h ǎo @你好 :2.0"
+    assert format_keyword(line, boost=1.5, threshold=0.2) == "n ǐ h ǎo :2.0 #0.3 @你好"
+    assert format_keyword("n ǐ #0.3", boost=1.5) == "n ǐ :1.5 #0.3"
+
+
+def test_keyword_names():
+    assert keyword_names("n ǐ h ǎo :2.0 @你好小智") == {"你好小智"}
+    assert keyword_names("x iǎo zh ì @Hey_XiaoZhi") == {"hey_xiaozhi"}
+    # 没有 @ 时使用拼接后的 token，bpe 的 ▁ 同时按空格匹配
+    assert keyword_names("▁HE LLO ▁WORLD #0.2") == {"▁hello▁world", "hello world"}
+    assert keyword_names("你 好") == {"你好"}
+
+
+def test_update_keywords():
+    sherpa = _SherpaOnnx()
+    sherpa.update_keywords(
+        ["n ǐ h ǎo @你好", "  ", "x iǎo zh ì :3 @小智"], boost=1.5, threshold=0.2
+    )
+    assert sherpa.keywords == ["n ǐ h ǎo :1.5 #0.2 @你好", "x iǎo zh ì :3 #0.2 @小智"]
+    assert sherpa.names == {"你好", "小智"}
+
+    with pytest.raises(ValueError):
+        sherpa.update_keywords([])
+    with pytest.raises(ValueError):
+        sherpa.update_keywords(["", " "])
+    # 失败时保留原来的唤醒词
+    assert sherpa.names == {"你好", "小智"}
@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from xiaozhi.services.audio.gain import GainStage
+from xiaozhi.services.audio.stream import (
+    GlobalStream,
+    MyStream,
+    RingBuffer,
+    RingReader,
+)
+from xiaozhi.services.protocols.typing import AudioConfig
+
+
+def samples(start, count):
+    return np.arange(start, start + count, dtype=np.int16)
+
+
+def as_samples(frames):
+    return np.frombuffer(frames, dtype=np.int16).tolist()
+
+
+def test_ring_reader_reads_in_order_across_wraparound():
+    ring = RingBuffer(8)
+    reader = RingReader(ring)
+    ring.write(samples(0, 6))
+    assert as_samples(reader.read(4)) == [0, 1, 2, 3]
+    ring.write(samples(6, 5))  # 跨过缓冲区末尾
+    assert len(reader) == 7
+    assert as_samples(reader.read(7)) == list(range(4, 11))
+    assert len(reader) == 0
+
+
+def test_ring_reader_drop_oldest_keeps_latest_capacity():
+    ring = RingBuffer(8)
+    reader = RingReader(ring, overflow="drop_oldest")
+    ring.write(samples(0, 6))
+    ring.write(samples(6, 6))
+    assert len(reader) == 8
+    assert reader.overflowed
+    assert as_samples(reader.read(8)) == list(range(4, 12))
+
+
+def test_ring_reader_drop_all_keeps_last_write():
+    ring = RingBuffer(8)
+    reader = RingReader(ring, overflow="drop_all")
+    ring.write(samples(0, 6))
+    ring.write(samples(6, 4))
+    assert len(reader) == 4
+    assert reader.overflowed
+    assert as_samples(reader.read(8)) == [6, 7, 8, 9]
+
+
+def test_ring_write_larger_than_capacity():
+    ring = RingBuffer(4)
+    reader = RingReader(ring)
+    ring.write(samples(0, 10))
+    assert as_samples(reader.read(4)) == [6, 7, 8, 9]
+
+
+def test_ring_reader_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        RingReader(RingBuffer(4), overflow="block")
+
+
+def test_ring_readers_have_independent_cursors():
+    ring = RingBuffer(16)
+    first = RingReader(ring)
+    ring.write(samples(0, 4))
+    second = RingReader(ring)  # 只能读到创建之后写入的数据
+    ring.write(samples(4, 4))
+
+    assert as_samples(first.read(2)) == [0, 1]
+    assert as_samples(second.read(8)) == [4, 5, 6, 7]
+    assert as_samples(first.read(8)) == [2, 3, 4, 5, 6, 7]
+    first.clear()
+    ring.write(samples(8, 2))
+    assert as_samples(first.read(8)) == [8, 9]
+    assert as_samples(second.read(8)) == [8, 9]
+
+
+@pytest.fixture
+def global_stream():
+    gain, ring = GlobalStream.gain, GlobalStream.ring
+    GlobalStream.gain = GainStage(gain=1)
+    GlobalStream.ring = RingBuffer(64)
+    yield GlobalStream
+    GlobalStream.gain, GlobalStream.ring = gain, ring
+    GlobalStream.readers.clear()
+
+
+def open_input():
+    return MyStream(
+        rate=AudioConfig.SAMPLE_RATE,
+        channels=1,
+        format=AudioConfig.FORMAT,
+        input=True,
+    )
+
+
+def test_my_stream_readers_share_input(global_stream):
+    first, second = open_input(), open_input()
+    global_stream.input(samples(0, 8).tobytes())
+
+    data = first.read(4)
+    assert isinstance(data, bytes)
+    assert as_samples(data) == [0, 1, 2, 3]
+    assert as_samples(second.read()) == list(range(8))
+    # 不足 num_frames 时返回空字节，不消费数据
+    assert first.read(8) == b""
+    assert as_samples(first.read(4)) == [4, 5, 6, 7]
+
+    # 返回的数据不会被后续读取覆盖
+    global_stream.input(samples(8, 4).tobytes())
+    assert as_samples(data) == [0, 1, 2, 3]
+
+    second.stop_stream()
+    assert second.read() == b""
+    assert second.get_read_available() == 0
+
+
+def test_my_stream_exception_on_overflow(global_stream):
+    stream = open_input()
+    global_stream.input(samples(0, 100).tobytes())
+    with pytest.raises(IOError):
+        stream.read(8, exception_on_overflow=True)
+    assert as_samples(stream.read(4)) == [36, 37, 38, 39]
+
+
+def test_my_stream_blocking_read_timeout(global_stream):
+    stream = open_input()
+    start = time.monotonic()
+    assert stream.read(4, timeout=0.05) == b""
+    assert time.monotonic() - start >= 0.05
+    assert not stream.wait(4, timeout=0.01)
+
+    timer = threading.Timer(
+        0.02, global_stream.input, args=(samples(0, 4).tobytes(),)
+    )
+    timer.start()
+    assert as_samples(stream.read(4, timeout=1)) == [0, 1, 2, 3]
+    timer.join()
+
+
+def test_my_stream_async_read(global_stream):
+    stream = open_input()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        task = asyncio.create_task(stream.aread(6))
+        await asyncio.sleep(0.01)
+        # 数据不足时一直挂起
+        loop.call_soon(global_stream.input, samples(0, 4).tobytes())
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(asyncio.shield(task), 0.05)
+        # 在其他线程写入数据后恢复
+        threading.Thread(
+            target=global_stream.input, args=(samples(4, 4).tobytes(),)
+        ).start()
+        return await asyncio.wait_for(task, 1)
+
+    assert as_samples(asyncio.run(main())) == [0, 1, 2, 3, 4, 5]
+
+
+def test_stop_stream_wakes_blocking_readers(global_stream):
+    stream = open_input()
+    threading.Timer(0.05, stream.stop_stream).start()
+    start = time.monotonic()
+    assert stream.read(4, timeout=None) == b""
+    assert time.monotonic() - start < 1
+    # 已停止的音频流直接返回
+    assert stream.read(4, timeout=None) == b""
+    assert not stream.wait(4, timeout=None)
+
+    threading.Timer(0.05, stream.start_stream).start()
+    assert stream.wait_active(timeout=1)
+
+
+def test_stop_stream_wakes_async_readers(global_stream):
+    stream = open_input()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        task = asyncio.create_task(stream.aread(4))
+        await asyncio.sleep(0.01)
+        # 在其他线程中停止音频流
+        await loop.run_in_executor(None, stream.stop_stream)
+        frames = await asyncio.wait_for(task, 1)
+        assert await stream.aread(4) == b""
+
+        waiter = asyncio.create_task(stream.await_active())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        stream.start_stream()
+        await asyncio.wait_for(waiter, 1)
+        return frames
+
+    assert asyncio.run(main()) == b""
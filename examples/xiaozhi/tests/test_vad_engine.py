@@ -0,0 +1,122 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from xiaozhi.utils.file import get_model_file_path
+
+MODEL_PATH = get_model_file_path("silero_vad.onnx")
+
+pytestmark = pytest.mark.skipif(
+    not os.path.isfile(MODEL_PATH), reason="silero_vad.onnx 模型文件不存在"
+)
+
+
+@pytest.fixture
+def engine():
+    from xiaozhi.services.audio.vad.engine import VADEngine
+
+    return VADEngine(MODEL_PATH, capacity=2)
+
+
+def speech_like(seed, num_samples):
+    """带噪声的调幅正弦波，让各路流的语音概率明显不同"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_samples) / 16000
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * (1 + seed) * t)
+    signal = envelope * np.sin(2 * np.pi * (150 + 40 * seed) * t)
+    signal += 0.05 * rng.standard_normal(num_samples)
+    return (np.clip(signal, -1, 1) * 20000).astype(np.int16)
+
+
+def test_batched_probs_match_per_stream_wrapper(engine):
+    from xiaozhi.services.audio.vad.silero import OnnxWrapper
+
+    # 每路流写入的长度不同，有的不足一个窗口，有的一次写入多个窗口
+    chunk_sizes = [
+        [512, 1000, 24, 2048],
+        [300, 300, 300, 3000],
+        [4096, 0, 512, 100],
+    ]
+    audios = [speech_like(i, sum(sizes)) for i, sizes in enumerate(chunk_sizes)]
+    streams = [engine.register(f"speaker-{i}") for i in range(len(audios))]
+    batched = [[] for _ in audios]
+
+    for step in range(len(chunk_sizes[0])):
+        for i, stream in enumerate(streams):
+            start = sum(chunk_sizes[i][:step])
+            stream.write(audios[i][start : start + chunk_sizes[i][step]].tobytes())
+        results = engine.process()
+        for i, stream in enumerate(streams):
+            batched[i].extend(results[stream.stream_id])
+
+    for audio, probs in zip(audios, batched):
+        wrapper = OnnxWrapper(MODEL_PATH)
+        expected = wrapper.stream(audio).copy()
+        assert len(probs) == len(audio) // 512
+        np.testing.assert_allclose(probs, expected, atol=1e-5)
+
+
+def test_reset_and_reused_slot_start_from_clean_state(engine):
+    from xiaozhi.services.audio.vad.silero import OnnxWrapper
+
+    audio = speech_like(3, 4096)
+    first = engine.register()
+    first.write(speech_like(4, 4096))
+    engine.process()
+    engine.unregister(first)
+
+    # 新注册的流复用了 first 的 slot，但不能继承它的状态
+    second = engine.register()
+    second.write(audio)
+    probs = engine.process()[second.stream_id]
+    expected = OnnxWrapper(MODEL_PATH).stream(audio)
+    np.testing.assert_allclose(probs, expected, atol=1e-5)
+
+
+def test_register_ids_are_not_reused(engine):
+    s0 = engine.register()
+    s1 = engine.register()
+    engine.unregister(s0)
+    s2 = engine.register()
+    assert s2 is not s1
+    assert len({s0.stream_id, s1.stream_id, s2.stream_id}) == 3
+    assert engine.register(s1.stream_id) is s1
+    # 容量不够时自动扩容
+    streams = [engine.register() for _ in range(4)]
+    assert len({stream.slot for stream in streams + [s1, s2]}) == 6
+
+
+def test_concurrent_write_and_process(engine):
+    audio = speech_like(5, 512 * 40)
+    streams = [engine.register() for _ in range(4)]
+    totals = {stream.stream_id: 0 for stream in streams}
+
+    def writer(stream):
+        for start in range(0, len(audio), 160):
+            stream.write(audio[start : start + 160])
+
+    threads = [threading.Thread(target=writer, args=(s,)) for s in streams]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        for stream_id, probs in engine.process().items():
+            totals[stream_id] += len(probs)
+    for stream_id, probs in engine.process().items():
+        totals[stream_id] += len(probs)
+
+    # 所有写入的窗口都被推理了一次，没有丢失或重复
+    assert set(totals.values()) == {40}
+
+
+def test_clear_stream_matches_fresh_wrapper():
+    from xiaozhi.services.audio.vad.silero import OnnxWrapper
+
+    wrapper = OnnxWrapper(MODEL_PATH)
+    wrapper.stream(speech_like(6, 4096 + 100))
+    wrapper.clear_stream()
+
+    audio = speech_like(7, 4096)
+    expected = OnnxWrapper(MODEL_PATH).stream(audio)
+    np.testing.assert_allclose(wrapper.stream(audio), expected, atol=1e-5)
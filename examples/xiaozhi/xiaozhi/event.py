@@ -10,8 +10,10 @@ from xiaozhi.ref import (
     get_xiaozhi,
     set_speech_frames,
 )
+from xiaozhi.services.audio.segment import SpeechEnd
 from xiaozhi.services.protocols.typing import AbortReason, DeviceState, ListeningMode
 from xiaozhi.utils.base import get_env
+from xiaozhi.utils.trace import Tracer
 
 
 class Step:
@@ -35,6 +37,7 @@ class __EventManager:
             return
 
         self.current_step = step
+        Tracer.mark(step)
         if self.next_step_future:
             get_xiaoai().async_loop.call_soon_threadsafe(
                 self.next_step_future.set_result, (step, step_data)
@@ -70,12 +73,14 @@ class __EventManager:
     def on_interrupt(self):
         """用户打断（小爱同学）"""
         self.session_id = self.session_id + 1
+        Tracer.start(self.session_id, Step.on_interrupt)
         self.update_step(Step.on_interrupt)
         self.start_session()
 
     def on_wakeup(self):
         """用户唤醒（你好小智）"""
         self.session_id = self.session_id + 1
+        Tracer.start(self.session_id, Step.on_wakeup)
         self.update_step(Step.on_wakeup)
         self.start_session()
 
@@ -84,7 +89,9 @@ class __EventManager:
         if self.current_step in [Step.on_interrupt, Step.on_tts_end]:
             # 当前 session 已经被打断了，不再处理
             return
+        Tracer.finish()
         self.session_id = self.session_id + 1
+        Tracer.start(self.session_id, Step.on_tts_end)
         self.update_step(Step.on_tts_end)
         self.start_session()
 
@@ -108,20 +115,38 @@ class __EventManager:
     async def __start_session(self):
         if not get_env("CLI"):
             return
+        Tracer.mark("start_session")
 
         vad = get_vad()
         codec = get_audio_codec()
         speaker = get_speaker()
         xiaozhi = get_xiaozhi()
 
+        if self.current_step == Step.on_tts_end:
+            # TTS 正常结束：等抖动缓冲区中剩下的音频播完，再停用输出流
+            session_id = self.session_id
+            await codec.drain_output()
+            if session_id != self.session_id:
+                # 等待期间被打断或重新唤醒，交给新的 session 处理
+                return
+
         # 先取消之前的 VAD 检测和音频输入输出流
         xiaozhi.set_device_state(DeviceState.IDLE)
+        # 连接已断开时立即重连，不等心跳的退避
+        await xiaozhi.protocol.ensure_connected()
         await xiaozhi.protocol.send_abort_speaking(AbortReason.ABORT)
+        if self.current_step != Step.on_tts_end:
+            # 被打断或重新唤醒时，丢弃还没播放的 TTS 音频
+            codec.clear_output()
 
         # 小爱同学唤醒时，直接打断
         if self.current_step == Step.on_interrupt:
             return
 
+        if vad.streaming:
+            await self.__start_streaming_session()
+            return
+
         # 等待 TTS 余音结束
         if self.current_step in [Step.on_tts_end]:
             vad.resume("silence")
@@ -151,7 +176,7 @@ class __EventManager:
         xiaozhi.set_device_state(DeviceState.LISTENING)
 
         # 等待说话结束
-        vad.resume("silence")
+        vad.resume("silence", endpoint=True)
         step, _ = await self.wait_next_step()
         if step != Step.on_silence:
             return
@@ -160,6 +185,52 @@ class __EventManager:
         await xiaozhi.protocol.send_stop_listening()
         xiaozhi.set_device_state(DeviceState.IDLE)
 
+    async def __start_streaming_session(self):
+        """流式 VAD 模式：检测到语音后立即开始上传，中间不再暂停/恢复 VAD"""
+        vad = get_vad()
+        codec = get_audio_codec()
+        speaker = get_speaker()
+        xiaozhi = get_xiaozhi()
+
+        # 先等待 TTS 余音结束，再检查是否有人说话
+        segments = vad.open_segments(wait_silence=self.current_step == Step.on_tts_end)
+        start = await segments.next(timeout=APP_CONFIG["wakeup"]["timeout"])
+        if start is None:
+            if segments.closed:
+                # 当前 session 已经结束
+                return
+            # 如果没人说话，则回到 IDLE 状态
+            xiaozhi.set_device_state(DeviceState.IDLE)
+            print("👋 已退出唤醒")
+            after_wakeup = APP_CONFIG["wakeup"]["after_wakeup"]
+            await after_wakeup(speaker)
+            return
+
+        # 开始说话
+        self.update_step(Step.on_speech)
+        await xiaozhi.protocol.send_start_listening(ListeningMode.MANUAL)
+        xiaozhi.set_device_state(DeviceState.LISTENING)
+        await self.__send_speech(codec.encode_speech(start.frames, reset=True))
+
+        # 边检测边上传，直到说话结束
+        async for event in segments:
+            if isinstance(event, SpeechEnd):
+                break
+            await self.__send_speech(codec.encode_speech(event.frames))
+        else:
+            # 当前 session 已经结束
+            return
+
+        # 停止说话
+        self.update_step(Step.on_silence)
+        await xiaozhi.protocol.send_stop_listening()
+        xiaozhi.set_device_state(DeviceState.IDLE)
+
+    async def __send_speech(self, opus_frames):
+        protocol = get_xiaozhi().protocol
+        if opus_frames and protocol.is_audio_channel_opened():
+            await protocol.send_audio(opus_frames)
+
     async def wakeup(self, text, source):
         before_wakeup = APP_CONFIG["wakeup"]["before_wakeup"]
         get_kws().pause()  # 暂停 KWS 检测
@@ -1,12 +1,23 @@
+import asyncio
+
 import opuslib_next as opuslib
 
+from config import APP_CONFIG
 from xiaozhi.ref import (
     get_speech_frames,
+    get_xiaoai,
     get_xiaozhi,
     set_audio_codec,
     set_speech_frames,
 )
-from xiaozhi.services.audio.stream import MyAudio
+from xiaozhi.services.audio.jitter import JitterBuffer
+from xiaozhi.services.audio.opus import (
+    OpusFrameEncoder,
+    create_encoder,
+    get_frame_size,
+)
+from xiaozhi.services.audio.resample import Resampler
+from xiaozhi.services.audio.stream import MyAudio, MyStream
 from xiaozhi.services.protocols.typing import AudioConfig
 from xiaozhi.utils.base import get_env
 
@@ -21,6 +32,10 @@ class AudioCodec:
         self.output_stream = None
         self.opus_encoder = None
         self.opus_decoder = None
+        self.frame_encoder = None
+        self.jitter_buffer = None
+        self.resampler = None
+        self.server_sample_rate = None
         self._is_closing = False
 
         self._initialize_audio()
@@ -40,89 +55,143 @@ class AudioCodec:
             input_device_index=MyAudio.get_input_device_index(self.audio),
         )
 
-        # 初始化音频输出流
+        # 初始化音频输出流（设备的输出采样率与服务端的采样率无关，需要时重采样）
+        protocol = get_xiaozhi().protocol
+        self.output_sample_rate = APP_CONFIG.get("output", {}).get(
+            "sample_rate", 24000
+        )
         self.output_stream = self.audio.open(
             output=True,
             format=AudioConfig.FORMAT,
             channels=AudioConfig.CHANNELS,
-            rate=get_xiaozhi().protocol.server_sample_rate,
-            frames_per_buffer=get_xiaozhi().protocol.server_frame_size,
+            rate=self.output_sample_rate,
+            frames_per_buffer=int(
+                self.output_sample_rate * protocol.server_frame_duration / 1000
+            ),
             output_device_index=MyAudio.get_output_device_index(self.audio),
         )
 
-        # 初始化Opus编码器
-        self.opus_encoder = opuslib.Encoder(
-            fs=AudioConfig.SAMPLE_RATE,
-            channels=AudioConfig.CHANNELS,
-            application=opuslib.APPLICATION_AUDIO,
+        # 初始化Opus编码器（编码参数见 APP_CONFIG["opus"]）
+        self.opus_encoder = create_encoder()
+        # 增量编码器：录音数据凑满一帧就编码
+        self.frame_encoder = OpusFrameEncoder(
+            self.opus_encoder, frame_size=get_frame_size()
         )
 
-        # 初始化Opus解码器
+        # 初始化Opus解码器（收到服务端 hello 后会按协商的参数重新配置）
+        self.configure_output(
+            protocol.server_sample_rate, protocol.server_frame_duration
+        )
+
+    def configure_output(self, sample_rate: int, frame_duration: int):
+        """按服务端的下行音频参数配置解码器、抖动缓冲区和重采样"""
+        if (
+            self.jitter_buffer
+            and self.opus_decoder
+            and self.server_sample_rate == sample_rate
+            and self.jitter_buffer.frame_duration == frame_duration
+        ):
+            return
+
+        if self.jitter_buffer:
+            self.jitter_buffer.stop()
+
+        self.server_sample_rate = sample_rate
         self.opus_decoder = opuslib.Decoder(
-            fs=get_xiaozhi().protocol.server_sample_rate,
+            fs=sample_rate,
             channels=AudioConfig.CHANNELS,
         )
-        self.temp_frames = bytes([])
+        self.resampler = (
+            Resampler(sample_rate, self.output_sample_rate)
+            if sample_rate != self.output_sample_rate
+            else None
+        )
 
-    def read_audio(self):
-        """读取音频输入数据并编码"""
-        try:
-            speech_frames = get_speech_frames()
+        # 下行音频的抖动缓冲区，由播放线程匀速解码播放
+        self.jitter_buffer = JitterBuffer.from_config(
+            self.opus_decoder,
+            frame_size=int(sample_rate * frame_duration / 1000),
+            frame_duration=frame_duration,
+            on_pcm=self._play_pcm,
+        )
+        self.jitter_buffer.start()
 
-            # 加入语音片段
-            if speech_frames:
-                self.temp_frames = speech_frames
-                set_speech_frames([])
+    def read_audio(self, timeout=0):
+        """
+        读取音频输入数据并编码
 
+        参数:
+            timeout: 数据不足时最长等待多久（秒），仅对小爱音箱的音频流有效
+        """
+        try:
             # 读取音频输入数据
-            data = self.input_stream.read(
-                num_frames=None if get_env("CLI") else AudioConfig.FRAME_SIZE,
-                exception_on_overflow=False,
-            )
-            if not data:
-                return None
-
-            self.temp_frames += data
-            if len(self.temp_frames) < AudioConfig.FRAME_SIZE * 2:
-                return None
-
-            opus_frames, remain_frames = self.encode_audio(self.temp_frames)
-            self.temp_frames = remain_frames
-            return opus_frames
+            if isinstance(self.input_stream, MyStream):
+                data = self.input_stream.read(
+                    num_frames=None if get_env("CLI") else AudioConfig.FRAME_SIZE,
+                    exception_on_overflow=False,
+                    timeout=timeout,
+                )
+            else:
+                data = self.input_stream.read(
+                    AudioConfig.FRAME_SIZE, exception_on_overflow=False
+                )
+            return self._encode_input(data)
         except Exception:
             return None
 
-    def write_audio(self, opus_data):
-        """解码并播放"""
+    async def aread_audio(self):
+        """异步读取音频输入数据并编码（仅支持小爱音箱的音频流）"""
         try:
-            pcm_data = self.decode_audio(opus_data)  # 解码
-            self.output_stream.write(pcm_data)  # 播放
+            data = await self.input_stream.aread(
+                None if get_env("CLI") else AudioConfig.FRAME_SIZE
+            )
+            return self._encode_input(data)
         except Exception:
-            pass
+            return None
 
-    def decode_audio(self, opus_data):
-        """解码音频数据"""
-        return self.opus_decoder.decode(
-            opus_data,
-            frame_size=get_xiaozhi().protocol.server_frame_size,
-            decode_fec=False,
-        )
+    def encode_speech(self, frames, reset=False):
+        """编码 VAD 直接交过来的语音（流式 VAD 模式）"""
+        if reset:
+            self.frame_encoder.reset()
+        return self._encode_input(frames)
 
-    def encode_audio(self, buffer: bytes, frame_size=AudioConfig.FRAME_SIZE):
-        """编码音频数据"""
+    def _encode_input(self, data):
+        """把语音片段和录音数据写入增量编码器，返回编码好的完整音频帧"""
+        speech_frames = get_speech_frames()
         opus_frames = []
-        remain_frames = bytes([])
-        try:
-            for i in range(0, len(buffer), frame_size * 2):
-                chunk = buffer[i : i + frame_size * 2]
-                if len(chunk) < frame_size * 2:
-                    remain_frames = chunk
-                    break
-                opus_frame = self.opus_encoder.encode(chunk, frame_size)
-                opus_frames.append(opus_frame)
-            return opus_frames, remain_frames
-        except Exception:
-            return None, remain_frames
+
+        # 加入语音片段（丢弃之前不足一帧的录音）
+        if speech_frames:
+            self.frame_encoder.reset()
+            opus_frames.extend(self.frame_encoder.encode(speech_frames))
+            set_speech_frames(None)
+
+        if data:
+            opus_frames.extend(self.frame_encoder.encode(data))
+        return opus_frames or None
+
+    def write_audio(self, opus_data):
+        """放入抖动缓冲区，由播放线程解码并播放"""
+        self.jitter_buffer.push(opus_data)
+
+    def _play_pcm(self, pcm_data):
+        """播放解码后的音频"""
+        if self.resampler:
+            pcm_data = self.resampler.process(pcm_data)
+        self.output_stream.write(pcm_data)
+
+    async def drain_output(self):
+        """等待抖动缓冲区中剩下的音频播放完毕（TTS 正常结束时）"""
+        if self.jitter_buffer:
+            await asyncio.to_thread(self.jitter_buffer.drain)
+
+    def clear_output(self):
+        """丢弃还没播放的音频（被打断时）"""
+        if self.jitter_buffer:
+            self.jitter_buffer.clear()
+        output_scheduler = getattr(get_xiaoai(), "output_scheduler", None)
+        if output_scheduler:
+            output_scheduler.clear()
 
     def start_streams(self):
         """启动音频流"""
@@ -176,6 +245,10 @@ class AudioCodec:
             # 清理编解码器
             self.opus_encoder = None
             self.opus_decoder = None
+            self.frame_encoder = None
+            if self.jitter_buffer:
+                self.jitter_buffer.stop()
+                self.jitter_buffer = None
         except Exception:
             pass
         finally:
@@ -0,0 +1,198 @@
+import asyncio
+import threading
+from typing import Optional
+
+import numpy as np
+
+from config import APP_CONFIG
+from xiaozhi.services.audio.gate import EnergyGate
+from xiaozhi.services.audio.kws import KWS
+from xiaozhi.services.audio.kws.sherpa import SherpaOnnx
+from xiaozhi.services.audio.stream import MyAudio
+from xiaozhi.services.audio.vad import VAD
+from xiaozhi.services.audio.vad.silero import Silero
+from xiaozhi.services.protocols.typing import AudioConfig
+from xiaozhi.utils.base import get_env
+
+
+class _AcousticFrontend:
+    """
+    KWS 和 VAD 共享的声学前端
+
+    - 只打开一个录音流，在同一个线程（或协程）中处理 KWS 和 VAD
+    - 每块音频只做一次 int16 -> float32 转换，Silero 和 Sherpa 共用
+    - KWS 由 VAD 的语音概率控制：没人说话时不跑唤醒词模型，
+      检测到语音时先补上之前 kws_preroll 的音频，语音结束后再保持 kws_hangover
+    """
+
+    def __init__(self):
+        config = APP_CONFIG.get("frontend", {})
+        self.enabled = config.get("enabled", False) and bool(get_env("CLI"))
+        self.sample_rate = AudioConfig.SAMPLE_RATE
+        self.window_size = 512
+        self.kws_threshold = config.get("kws_threshold", 0.3)
+        self.kws_hangover = int(
+            self.sample_rate * config.get("kws_hangover", 500) / 1000
+        )
+        self.gate = EnergyGate.from_config()
+
+        self.stream = None
+        self.samples = np.zeros(0, dtype=np.float32)
+        # KWS 关闭期间最近一段音频，打开时先送入 KWS
+        self.preroll = np.zeros(
+            int(self.sample_rate * config.get("kws_preroll", 300) / 1000),
+            dtype=np.float32,
+        )
+        self.preroll_size = 0
+        self.kws_open = False
+        self.kws_hold = 0  # 语音结束后 KWS 还要保持多少个采样点
+        self.metrics = {
+            "blocks": 0,  # 处理的音频块
+            "vad_windows": 0,  # Silero 推理的窗口数
+            "kws_blocks": 0,  # 送入 KWS 的音频块
+            "kws_skipped": 0,  # 因为没人说话跳过 KWS 的音频块
+        }
+
+    def start(self):
+        """启动共享前端（替代 VAD.start 和 KWS.start）"""
+        self._initialize_audio_stream()
+        threading.Thread(target=self._detection_loop, daemon=True).start()
+
+    def start_async(self, executor):
+        """在当前事件循环中启动共享前端（单事件循环模式）"""
+        self._initialize_audio_stream()
+        asyncio.get_running_loop().create_task(self._detection_task(executor))
+
+    def _initialize_audio_stream(self):
+        self.audio = MyAudio.create()
+        self.stream = self.audio.open(
+            format=AudioConfig.FORMAT,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            frames_per_buffer=self.window_size,
+            start=True,
+        )
+
+    def _backlog_frames(self) -> int:
+        """本次读取的帧数：至少一个窗口，有积压时一次读完所有完整窗口"""
+        available = self.stream.get_read_available()
+        window_size = self.window_size
+        return max(window_size, available // window_size * window_size)
+
+    def _to_float(self, frames) -> np.ndarray:
+        """int16 -> float32，写入复用的缓冲区"""
+        samples = np.frombuffer(frames, dtype=np.int16)
+        if len(self.samples) < len(samples):
+            self.samples = np.zeros(len(samples), dtype=np.float32)
+        x = self.samples[: len(samples)]
+        np.multiply(samples, 1 / 32768.0, out=x, dtype=np.float32)
+        return x
+
+    def _remember(self, x: np.ndarray):
+        """保留最近 kws_preroll 的音频"""
+        size = len(self.preroll)
+        if len(x) >= size:
+            self.preroll[:] = x[len(x) - size :]
+        elif len(x):
+            self.preroll[: size - len(x)] = self.preroll[len(x) :]
+            self.preroll[size - len(x) :] = x
+        self.preroll_size = min(size, self.preroll_size + len(x))
+
+    def _should_run_kws(self, x: np.ndarray, speech_probs) -> bool:
+        if speech_probs is None:
+            return True
+        if len(speech_probs) and speech_probs.max() >= self.kws_threshold:
+            self.kws_hold = self.kws_hangover
+            return True
+        if self.kws_hold > 0:
+            self.kws_hold -= len(x)
+            return True
+        return False
+
+    def _kws(self, x: np.ndarray, speech_probs) -> Optional[str]:
+        if not self._should_run_kws(x, speech_probs):
+            self.kws_open = False
+            self._remember(x)
+            self.metrics["kws_skipped"] += 1
+            return None
+
+        self.metrics["kws_blocks"] += 1
+        result = None
+        if not self.kws_open and self.preroll_size:
+            # 补上语音开始前的音频，避免唤醒词的开头被截掉
+            start = len(self.preroll) - self.preroll_size
+            result = SherpaOnnx.kws_samples(self.preroll[start:])
+            self.preroll_size = 0
+        self.kws_open = True
+        return SherpaOnnx.kws_samples(x) or result
+
+    def _infer(self, frames, run_vad: bool, run_kws: bool):
+        """
+        模型推理：返回 (每个窗口的语音概率, 唤醒词)
+
+        不需要 VAD 也不需要按语音概率控制 KWS 时不跑 Silero。
+        """
+        self.metrics["blocks"] += 1
+        x = self._to_float(frames)
+        speech_probs = None
+        if run_vad or (run_kws and self.kws_threshold > 0):
+            if self.gate.is_open(frames, self.window_size):
+                speech_probs = Silero.vad_samples(x, self.sample_rate)
+                self.metrics["vad_windows"] += len(speech_probs)
+            else:
+                # 跳过的音频没有送入模型，不能接着之前的循环状态继续推理
+                Silero.reset()
+                speech_probs = np.zeros(len(x) // self.window_size, dtype=np.float32)
+
+        result = None
+        if run_kws:
+            result = self._kws(x, speech_probs)
+        else:
+            self.kws_open = False
+        return speech_probs, result
+
+    def _dispatch(self, frames, speech_probs, result):
+        if speech_probs is not None:
+            VAD.process(frames, speech_probs)
+        if result:
+            print(f"🔥 触发唤醒: {result}")
+            KWS.on_message(result)
+
+    def _detection_loop(self):
+        SherpaOnnx.start()
+        self.stream.start_stream()
+        while True:
+            # 阻塞读取缓冲区音频数据，收到新数据时立即唤醒
+            num_frames = self._backlog_frames()
+            frames = self.stream.read(num_frames, timeout=1)
+            if len(frames) != num_frames * 2:
+                continue
+
+            run_vad = not VAD.paused
+            run_kws = not KWS._is_skipped()
+            if not run_vad and not run_kws:
+                continue
+            speech_probs, result = self._infer(frames, run_vad, run_kws)
+            self._dispatch(frames, speech_probs if run_vad else None, result)
+
+    async def _detection_task(self, executor):
+        """共享前端协程，模型推理交给 executor 线程池执行"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, SherpaOnnx.start)
+        self.stream.start_stream()
+        while True:
+            frames = await self.stream.aread(self._backlog_frames())
+            if not frames:
+                continue
+            run_vad = not VAD.paused
+            run_kws = not KWS._is_skipped()
+            if not run_vad and not run_kws:
+                continue
+            speech_probs, result = await loop.run_in_executor(
+                executor, self._infer, frames, run_vad, run_kws
+            )
+            self._dispatch(frames, speech_probs if run_vad else None, result)
+
+
+Frontend = _AcousticFrontend()
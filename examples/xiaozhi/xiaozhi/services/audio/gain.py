@@ -0,0 +1,126 @@
+import math
+
+import numpy as np
+
+from config import APP_CONFIG
+from xiaozhi.services.protocols.typing import AudioConfig
+
+
+def db_to_amplitude(db: float) -> float:
+    """dBFS 转换为 int16 幅值"""
+    return 32768.0 * (10 ** (db / 20))
+
+
+class GainStage:
+    """
+    麦克风增益
+
+    - 固定增益：int16 饱和放大（超出范围时削波，而不是溢出回绕）
+    - 自动增益（AGC）：根据每块音频的 RMS 平滑调整增益，使语音保持在目标音量附近
+
+    所有中间结果都写入预分配的缓冲区，处理每块音频时不会产生新的内存分配。
+    """
+
+    def __init__(
+        self,
+        gain: float = 10,
+        agc: bool = False,
+        target_level: float = -20,
+        noise_floor: float = -65,
+        min_gain: float = 1,
+        max_gain: float = 30,
+        attack: float = 0.02,
+        release: float = 0.5,
+        sample_rate: int = AudioConfig.SAMPLE_RATE,
+    ):
+        """
+        参数:
+            gain: 固定增益倍数（开启 AGC 时作为初始增益）
+            agc: 是否开启自动增益
+            target_level: AGC 目标音量（dBFS）
+            noise_floor: 低于该音量（dBFS，放大前）时视为环境噪音，保持当前增益不变
+            min_gain: AGC 最小增益倍数
+            max_gain: AGC 最大增益倍数
+            attack: 增益下降的时间常数（秒），越小对突发大音量的响应越快
+            release: 增益上升的时间常数（秒），越大越不容易放大背景噪音
+            sample_rate: 采样率
+        """
+        self.gain = float(gain)
+        self.agc = agc
+        self.target_rms = db_to_amplitude(target_level)
+        self.noise_floor_rms = db_to_amplitude(noise_floor)
+        self.min_gain = min_gain
+        self.max_gain = max_gain
+        self.attack = attack
+        self.release = release
+        self.sample_rate = sample_rate
+
+        self._capacity = 0
+        self._ensure_capacity(AudioConfig.FRAME_SIZE)
+
+    @classmethod
+    def from_config(cls):
+        agc = APP_CONFIG.get("agc", {})
+        return cls(
+            gain=APP_CONFIG.get("vad", {}).get("boost", 1),
+            agc=agc.get("enabled", False),
+            target_level=agc.get("target_level", -20),
+            noise_floor=agc.get("noise_floor", -65),
+            min_gain=agc.get("min_gain", 1),
+            max_gain=agc.get("max_gain", 30),
+            attack=agc.get("attack", 0.02),
+            release=agc.get("release", 0.5),
+        )
+
+    def _ensure_capacity(self, num_samples: int):
+        if num_samples <= self._capacity:
+            return
+        self._capacity = num_samples
+        self._work = np.zeros(num_samples, dtype=np.float32)
+        self._ramp = np.zeros(num_samples, dtype=np.float32)
+        self._steps = np.arange(1, num_samples + 1, dtype=np.float32)
+        self._output = np.zeros(num_samples, dtype=np.int16)
+
+    def _update_gain(self, samples: np.ndarray) -> float:
+        """根据当前音频块的 RMS 计算新的增益"""
+        work = self._work[: len(samples)]
+        np.multiply(samples, samples, out=work, dtype=np.float32)
+        rms = math.sqrt(float(work.mean()))
+        if rms < self.noise_floor_rms:
+            return self.gain
+
+        desired = min(max(self.target_rms / rms, self.min_gain), self.max_gain)
+        duration = len(samples) / self.sample_rate
+        tau = self.attack if desired < self.gain else self.release
+        alpha = 1 - math.exp(-duration / tau) if tau > 0 else 1
+        return self.gain + alpha * (desired - self.gain)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        放大 int16 采样点
+
+        返回的数组指向内部输出缓冲区，在下一次 process 之前有效。
+        """
+        num_samples = len(samples)
+        self._ensure_capacity(num_samples)
+        work = self._work[:num_samples]
+        output = self._output[:num_samples]
+
+        if not self.agc:
+            if self.gain == 1:
+                output[:] = samples
+                return output
+            np.multiply(samples, self.gain, out=work, dtype=np.float32)
+        else:
+            # 在当前块内线性过渡到新的增益，避免增益跳变产生爆音
+            gain = self._update_gain(samples)
+            ramp = self._ramp[:num_samples]
+            step = (gain - self.gain) / num_samples
+            np.multiply(self._steps[:num_samples], step, out=ramp)
+            ramp += self.gain
+            np.multiply(samples, ramp, out=work, dtype=np.float32)
+            self.gain = gain
+
+        np.clip(work, -32768, 32767, out=work)
+        output[:] = work
+        return output
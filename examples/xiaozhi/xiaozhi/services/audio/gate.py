@@ -0,0 +1,139 @@
+import math
+
+import numpy as np
+
+from config import APP_CONFIG
+from xiaozhi.services.audio.gain import db_to_amplitude
+from xiaozhi.services.protocols.typing import AudioConfig
+
+
+class EnergyGate:
+    """
+    能量门限
+
+    在 VAD / KWS 模型前面按窗口计算 RMS 和过零率，明显低于环境噪音的窗口直接跳过模型推理。
+
+    - 环境噪音：安静时快速跟随、有声音时缓慢上升，自动适应房间的底噪
+    - 过零率：音量只略高于门限、但过零率很高的窗口视为嘶嘶声之类的宽带噪音
+    - 拖尾（hangover）：门限打开后保持一段时间，避免切掉词尾和轻辅音
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        margin: float = 6,
+        min_level: float = -60,
+        max_zero_crossing_rate: float = 0.35,
+        hangover: float = 300,
+        noise_rise: float = 5,
+        noise_fall: float = 0.1,
+        sample_rate: int = AudioConfig.SAMPLE_RATE,
+    ):
+        """
+        参数:
+            enabled: 是否开启（关闭时所有窗口都会送入模型）
+            margin: 高于环境噪音多少分贝时打开门限（dB）
+            min_level: 最低门限（dBFS），环境噪音估计不会低于该值
+            max_zero_crossing_rate: 音量接近门限时允许的最大过零率（0-1）
+            hangover: 门限关闭前的拖尾时长（ms）
+            noise_rise: 环境噪音估计上升的时间常数（秒）
+            noise_fall: 环境噪音估计下降的时间常数（秒）
+            sample_rate: 采样率
+        """
+        self.enabled = enabled
+        self.margin = 10 ** (margin / 20)
+        self.min_rms = db_to_amplitude(min_level)
+        self.max_zero_crossing_rate = max_zero_crossing_rate
+        self.hangover = int(hangover * sample_rate / 1000)
+        self.noise_rise = noise_rise
+        self.noise_fall = noise_fall
+        self.sample_rate = sample_rate
+
+        self.noise_floor = self.min_rms
+        self._hangover_left = 0
+
+        # 统计：送入模型 / 跳过的窗口数
+        self.evaluated = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_config(cls):
+        config = APP_CONFIG.get("gate", {})
+        return cls(
+            enabled=config.get("enabled", False),
+            margin=config.get("margin", 6),
+            min_level=config.get("min_level", -60),
+            max_zero_crossing_rate=config.get("max_zero_crossing_rate", 0.35),
+            hangover=config.get("hangover", 300),
+        )
+
+    def reset(self):
+        """重置拖尾状态（环境噪音估计保留）"""
+        self._hangover_left = 0
+
+    def stats(self) -> dict:
+        total = self.evaluated + self.skipped
+        return {
+            "evaluated": self.evaluated,
+            "skipped": self.skipped,
+            "skip_ratio": self.skipped / total if total else 0,
+            "noise_floor": 20 * math.log10(self.noise_floor / 32768.0),
+        }
+
+    def _update_noise_floor(self, rms: float, num_samples: int):
+        duration = num_samples / self.sample_rate
+        tau = self.noise_fall if rms < self.noise_floor else self.noise_rise
+        alpha = 1 - math.exp(-duration / tau)
+        self.noise_floor = max(
+            self.noise_floor + alpha * (rms - self.noise_floor), self.min_rms
+        )
+
+    def process(self, frames, window_size: int) -> np.ndarray:
+        """
+        逐窗口判断是否需要送入模型
+
+        返回每个窗口的布尔值（True 表示需要推理），不足一个窗口的尾部不计入。
+        """
+        samples = np.frombuffer(frames, dtype=np.int16)
+        num_windows = len(samples) // window_size
+        if not self.enabled:
+            return np.ones(num_windows, dtype=bool)
+
+        windows = samples[: num_windows * window_size].reshape(num_windows, -1)
+        power = np.einsum("ij,ij->i", windows, windows, dtype=np.float64)
+        rms = np.sqrt(power / window_size)
+        signs = np.signbit(windows)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / window_size
+
+        mask = np.zeros(num_windows, dtype=bool)
+        for idx in range(num_windows):
+            threshold = self.noise_floor * self.margin
+            active = rms[idx] >= threshold
+            # 只略高于门限的高过零率窗口视为宽带噪音
+            if active and rms[idx] < threshold * self.margin:
+                active = zcr[idx] <= self.max_zero_crossing_rate
+
+            self._update_noise_floor(rms[idx], window_size)
+            if active:
+                self._hangover_left = self.hangover
+            elif self._hangover_left > 0:
+                self._hangover_left -= window_size
+                active = True
+            mask[idx] = active
+        return mask
+
+    def is_open(self, frames, window_size: int = AudioConfig.FRAME_SIZE) -> bool:
+        """
+        整块音频中只要有一个窗口需要推理就返回 True
+
+        模型按整块推理，统计也按整块计算：打开时所有窗口计入 evaluated，
+        关闭时所有窗口计入 skipped。
+        """
+        mask = self.process(frames, window_size)
+        if len(mask) == 0:
+            return True
+        if mask.any():
+            self.evaluated += len(mask)
+            return True
+        self.skipped += len(mask)
+        return False
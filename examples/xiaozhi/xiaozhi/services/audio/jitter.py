@@ -0,0 +1,264 @@
+import threading
+import time
+from typing import Callable, Optional
+
+import opuslib_next as opuslib
+
+from config import APP_CONFIG
+
+
+class JitterBuffer:
+    """
+    下行 Opus 音频的自适应抖动缓冲区
+
+    - 收到的 Opus 包按序号排好序，播放线程按帧时长匀速取出、解码后交给 on_pcm
+    - 开始播放前先缓冲 target_delay，播放中出现欠载（缓冲区空了）时自动加大缓冲
+    - 缺失的帧：下一帧已到达时用它携带的 FEC 数据恢复，否则用 PLC 生成补偿音频
+    - 连续补偿 max_concealed 帧后认为这段音频已经播完，停止播放并重新缓冲
+
+    websocket 协议 v1 的音频包不带序号，未传入 seq 时按到达顺序编号（TCP 不会乱序，只会晚到）。
+    带序号时，播放时间已经过了才到达的包计为迟到，直接丢弃。
+    """
+
+    def __init__(
+        self,
+        decoder: opuslib.Decoder,
+        frame_size: int,
+        frame_duration: float = 60,
+        on_pcm: Optional[Callable[[bytes], None]] = None,
+        target_delay: float = 120,
+        max_delay: float = 480,
+        max_buffer: float = 5000,
+        max_concealed: int = 2,
+        stable_frames: int = 100,
+    ):
+        """
+        参数:
+            decoder: Opus 解码器
+            frame_size: 每帧采样点数
+            frame_duration: 每帧时长（ms）
+            on_pcm: 解码后的 PCM 回调（在播放线程中调用）
+            target_delay: 初始缓冲时长（ms）
+            max_delay: 自适应缓冲时长的上限（ms）
+            max_buffer: 缓冲区最多保存多少音频（ms），超出时丢弃最早的包
+            max_concealed: 连续补偿多少帧后停止播放
+            stable_frames: 连续多少帧没有欠载后减小缓冲时长
+        """
+        self.decoder = decoder
+        self.frame_size = frame_size
+        self.frame_duration = frame_duration
+        self.on_pcm = on_pcm
+        self.min_depth = max(1, round(target_delay / frame_duration))
+        self.max_depth = max(self.min_depth, round(max_delay / frame_duration))
+        self.max_packets = max(self.max_depth, round(max_buffer / frame_duration))
+        self.max_concealed = max_concealed
+        self.stable_frames = stable_frames
+
+        self.target_depth = self.min_depth
+        self.packets: dict[int, bytes] = {}
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self._reset_sequence()
+        self.metrics = {
+            "received": 0,  # 收到的包
+            "played": 0,  # 正常解码播放的帧
+            "late": 0,  # 迟到丢弃的包
+            "overflow": 0,  # 缓冲区满了丢弃的包
+            "recovered": 0,  # FEC 恢复的帧
+            "concealed": 0,  # PLC 补偿的帧
+            "underruns": 0,  # 播放中缓冲区为空的次数
+            "max_depth": 0,  # 缓冲区的最大深度（包）
+        }
+
+    @classmethod
+    def from_config(cls, decoder, frame_size, frame_duration, on_pcm=None):
+        config = APP_CONFIG.get("jitter", {})
+        return cls(
+            decoder,
+            frame_size,
+            frame_duration,
+            on_pcm=on_pcm,
+            target_delay=config.get("target_delay", 120),
+            max_delay=config.get("max_delay", 480),
+            max_buffer=config.get("max_buffer", 5000),
+            max_concealed=config.get("max_concealed", 2),
+        )
+
+    def _reset_sequence(self):
+        self.playing = False
+        self.next_arrival = 0  # 下一个按到达顺序分配的序号
+        self.play_seq = 0  # 下一帧要播放的序号
+        self.concealed = 0  # 连续补偿的帧数
+        self.stable = 0  # 连续没有欠载的帧数
+
+    @property
+    def depth(self) -> int:
+        """缓冲区中的包数"""
+        return len(self.packets)
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "depth": self.depth,
+            "target_delay": self.target_depth * self.frame_duration,
+        }
+
+    def start(self):
+        if self.thread:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._playout_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread = None
+
+    def clear(self):
+        """丢弃缓冲区中的所有音频（比如被打断时）"""
+        with self.condition:
+            self.packets.clear()
+            self._reset_sequence()
+            self.condition.notify_all()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待缓冲区中的音频全部播放完毕（比如 TTS 正常结束时）
+
+        参数:
+            timeout: 最长等待时间（秒），None 表示按当前缓冲的音频时长估算
+
+        返回是否已经播完
+        """
+        with self.condition:
+            if timeout is None:
+                # 剩余的帧 + 播放结束前补偿的帧（每帧补偿前都会多等一帧）+ 余量
+                frames = self.depth + 2 * (self.max_concealed + 1)
+                timeout = frames * self.frame_duration / 1000
+            return self.condition.wait_for(
+                lambda: not self.running or not (self.packets or self.playing),
+                timeout=timeout,
+            )
+
+    def push(self, packet: bytes, seq: Optional[int] = None):
+        """收到一个 Opus 包"""
+        with self.condition:
+            if seq is None:
+                # 没有序号时不会迟到：补偿过的帧之后到达的包接着播放
+                seq = max(self.next_arrival, self.play_seq if self.playing else 0)
+            self.next_arrival = max(self.next_arrival, seq + 1)
+            self.metrics["received"] += 1
+
+            if self.playing and seq < self.play_seq:
+                self.metrics["late"] += 1
+                return
+
+            self.packets[seq] = packet
+            if len(self.packets) > self.max_packets:
+                del self.packets[min(self.packets)]
+                self.metrics["overflow"] += 1
+            self.metrics["max_depth"] = max(self.metrics["max_depth"], self.depth)
+            self.condition.notify_all()
+
+    def _wait_for_playout(self):
+        """等待缓冲到目标深度后开始播放"""
+        with self.condition:
+            while self.running:
+                if not self.packets:
+                    self.condition.wait()
+                    continue
+                if self.depth >= self.target_depth:
+                    break
+                # 缓冲不足目标深度但已经有一段时间没有新数据时（比如很短的音频），也开始播放
+                timeout = self.target_depth * self.frame_duration / 1000
+                if not self.condition.wait(timeout=timeout) and self.packets:
+                    break
+                # 等待期间可能被 clear 清空，重新检查
+            if not self.running:
+                return False
+            self.playing = True
+            self.play_seq = min(self.packets)
+            return True
+
+    def _next_frame(self) -> Optional[bytes]:
+        """取出下一帧并解码，播完时返回 None"""
+        with self.condition:
+            if not self.playing:
+                # 已被 clear
+                return None
+            seq = self.play_seq
+            if seq not in self.packets and seq + 1 not in self.packets:
+                # 播放线程提前了一帧，可以再等一帧的时间
+                self.condition.wait(timeout=self.frame_duration / 1000)
+                if not self.playing:
+                    return None
+            packet = self.packets.pop(seq, None)
+            next_packet = self.packets.get(seq + 1)
+            if packet is None:
+                if self.concealed >= self.max_concealed:
+                    # 这段音频已经播完，重新缓冲
+                    self.playing = False
+                    self.concealed = 0
+                    self.condition.notify_all()
+                    return None
+                self.concealed += 1
+                self.stable = 0
+            else:
+                self._on_packet()
+            self.play_seq = seq + 1
+
+        try:
+            if packet is not None:
+                self.metrics["played"] += 1
+                return self.decoder.decode(packet, self.frame_size, False)
+            if next_packet is not None:
+                # 下一帧里带有当前帧的 FEC 数据
+                self.metrics["recovered"] += 1
+                return self.decoder.decode(next_packet, self.frame_size, True)
+            self.metrics["concealed"] += 1
+            return self.decoder.decode(b"", self.frame_size, False)
+        except Exception:
+            return b""
+
+    def _on_packet(self):
+        """补偿之后又收到了后续的包，说明刚才是播放中的欠载，加大缓冲"""
+        if self.concealed:
+            self.concealed = 0
+            self.metrics["underruns"] += 1
+            self.target_depth = min(self.max_depth, self.target_depth + 1)
+            return
+
+        self.stable += 1
+        if self.stable >= self.stable_frames:
+            self.stable = 0
+            self.target_depth = max(self.min_depth, self.target_depth - 1)
+
+    def _playout_loop(self):
+        """播放线程：按帧时长匀速输出解码后的音频"""
+        frame_seconds = self.frame_duration / 1000
+        while self.running:
+            if not self._wait_for_playout():
+                continue
+
+            # 提前一帧写入，给输出设备留出余量
+            start = time.monotonic() - frame_seconds
+            count = 0
+            while self.running:
+                pcm = self._next_frame()
+                if pcm is None:
+                    break
+                if pcm and self.on_pcm:
+                    try:
+                        self.on_pcm(pcm)
+                    except Exception:
+                        pass
+                count += 1
+                delay = start + count * frame_seconds - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -self.max_depth * frame_seconds:
+                    # 输出阻塞太久，重新对齐时间
+                    start = time.monotonic() - count * frame_seconds
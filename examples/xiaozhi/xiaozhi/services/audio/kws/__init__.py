@@ -1,25 +1,54 @@
 import asyncio
 import os
 import threading
-import time
+from typing import Optional
+
+import numpy as np
 
 from config import APP_CONFIG
 from xiaozhi.event import EventManager
 from xiaozhi.ref import get_speaker, get_xiaoai, get_xiaozhi, set_kws
+from xiaozhi.services.audio.gate import EnergyGate
 from xiaozhi.services.audio.kws.sherpa import SherpaOnnx
-from xiaozhi.services.audio.stream import MyAudio
+from xiaozhi.services.audio.stream import MyAudio, RingBuffer
 from xiaozhi.services.protocols.typing import AudioConfig, DeviceState
 from xiaozhi.utils.base import get_env
+from xiaozhi.utils.trace import Tracer
 
 
 class _KWS:
     def __init__(self):
         set_kws(self)
+        self.gate = EnergyGate.from_config()
+        self.gate_open = False
+        # 门限关闭期间最近一段音频，门限打开时先送入 KWS，避免唤醒词开头被截掉
+        preroll = APP_CONFIG.get("gate", {}).get("preroll", 300)
+        self.preroll = RingBuffer(int(AudioConfig.SAMPLE_RATE * preroll / 1000))
+        self.preroll_output = np.zeros(self.preroll.capacity, dtype=np.int16)
+        self.paused = False
 
     def start(self):
         if not get_env("CLI"):
             return
 
+        self._initialize_audio_stream()
+
+        # 启动 KWS 服务
+        self.paused = False
+        self.thread = threading.Thread(target=self._detection_loop, daemon=True)
+        self.thread.start()
+
+    def start_async(self, executor):
+        """在当前事件循环中启动 KWS 服务（单事件循环模式）"""
+        if not get_env("CLI"):
+            return
+
+        self._initialize_audio_stream()
+
+        self.paused = False
+        asyncio.get_running_loop().create_task(self._detection_task(executor))
+
+    def _initialize_audio_stream(self):
         self.audio = MyAudio.create()
         self.stream = self.audio.open(
             format=AudioConfig.FORMAT,
@@ -30,11 +59,6 @@ class _KWS:
             start=True,
         )
 
-        # 启动 KWS 服务
-        self.paused = False
-        self.thread = threading.Thread(target=self._detection_loop, daemon=True)
-        self.thread.start()
-
     def get_file_path(self, file_name: str):
         current_dir = os.path.dirname(os.path.abspath(__file__))
         return os.path.join(current_dir, "../../../models", file_name)
@@ -42,27 +66,59 @@ class _KWS:
     def pause(self):
         self.paused = True
 
+    def update_keywords(self, keywords: list[str], boost=None, threshold=None):
+        """运行时替换唤醒词（keywords.txt 格式），不用重启也不用重新加载模型"""
+        SherpaOnnx.update_keywords(keywords, boost=boost, threshold=threshold)
+
+    def set_wake_words(self, texts: list[str], boost=None, threshold=None):
+        """运行时按唤醒词文本（同 APP_CONFIG["wakeup"]["keywords"]）替换唤醒词"""
+        from xiaozhi.services.audio.kws.keywords import compile_keywords
+
+        self.update_keywords(compile_keywords(texts), boost=boost, threshold=threshold)
+
     def resume(self):
         self.paused = False
 
+    def _gated(self, frames) -> Optional[bytes]:
+        """
+        经过能量门限后需要送入 KWS 的音频，门限关闭时返回 None
+
+        门限关闭期间的音频保存在 preroll 中，门限打开时拼接在前面一起送入 KWS。
+        """
+        if self._is_skipped():
+            self.gate_open = False
+            self.preroll.clear()
+            return None
+
+        if not self.gate.is_open(frames):
+            self.gate_open = False
+            if self.preroll.capacity:
+                self.preroll.write(np.frombuffer(frames, dtype=np.int16))
+            return None
+
+        if not self.gate_open and self.preroll.write_pos:
+            num_samples = min(self.preroll.write_pos, self.preroll.capacity)
+            self.preroll.copy_to(
+                self.preroll.write_pos - num_samples,
+                num_samples,
+                self.preroll_output,
+            )
+            frames = self.preroll_output[:num_samples].tobytes() + frames
+            self.preroll.clear()
+        self.gate_open = True
+        return frames
+
     def _detection_loop(self):
         SherpaOnnx.start()
         self.stream.start_stream()
         while True:
-            # 读取缓冲区音频数据
-            frames = self.stream.read()
-
-            # 在说话和监听状态时，暂停 KWS
-            if (
-                not frames
-                or self.paused
-                or get_xiaozhi().device_state
-                in [
-                    DeviceState.LISTENING,
-                    DeviceState.SPEAKING,
-                ]
-            ):
-                time.sleep(0.01)
+            # 阻塞读取缓冲区音频数据，收到新数据时立即唤醒
+            frames = self.stream.read(timeout=1)
+            if not frames:
+                continue
+
+            frames = self._gated(frames)
+            if frames is None:
                 continue
 
             result = SherpaOnnx.kws(frames)
@@ -70,7 +126,34 @@ class _KWS:
                 print(f"🔥 触发唤醒: {result}")
                 self.on_message(result)
 
+    async def _detection_task(self, executor):
+        """KWS 检测协程，模型推理交给 executor 线程池执行"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, SherpaOnnx.start)
+        self.stream.start_stream()
+        while True:
+            frames = await self.stream.aread()
+            if not frames:
+                continue
+
+            frames = self._gated(frames)
+            if frames is None:
+                continue
+
+            result = await loop.run_in_executor(executor, SherpaOnnx.kws, frames)
+            if result:
+                print(f"🔥 触发唤醒: {result}")
+                self.on_message(result)
+
+    def _is_skipped(self):
+        # 在说话和监听状态时，暂停 KWS
+        return self.paused or get_xiaozhi().device_state in [
+            DeviceState.LISTENING,
+            DeviceState.SPEAKING,
+        ]
+
     def on_message(self, text: str):
+        Tracer.wake("kws")
         asyncio.run_coroutine_threadsafe(
             EventManager.wakeup(text, "kws"),
             get_xiaoai().async_loop,
@@ -1,4 +1,8 @@
+import hashlib
+import json
+import os
 import re
+from typing import Optional
 
 from sherpa_onnx import text2token
 
@@ -20,6 +24,166 @@ init_project_context()
 from config import APP_CONFIG
 from xiaozhi.utils.file import get_model_file_path
 
+# CJK 统一表意文字的范围 [U+4E00, U+9FFF]（与 sherpa_onnx.text2token 一致）
+CJK_PATTERN = re.compile(r"([\u4e00-\u9fff])")
+
+CACHE_VERSION = 1
+
+
+def file_hash(path: Optional[str]) -> str:
+    if not path or not os.path.isfile(path):
+        return ""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class KeywordCache:
+    """
+    唤醒词编码缓存
+
+    token 表和每个短语的编码结果保存在一个 JSON 文件中，按 tokens.txt 和 bpe.model
+    的哈希区分。重新生成 keywords.txt 时只有新增或修改过的唤醒词需要重新编码，
+    token 表也不用每次重新读取和校验。
+    """
+
+    def __init__(
+        self,
+        tokens: str,
+        tokens_type: str = "cjkchar+bpe",
+        bpe_model: Optional[str] = None,
+        path: Optional[str] = None,
+    ):
+        self.tokens = tokens
+        self.tokens_type = tokens_type
+        self.bpe_model = bpe_model
+        self.path = path or get_model_file_path("keywords.cache.json")
+        self.key = "|".join(
+            [tokens_type, file_hash(tokens), file_hash(bpe_model), str(CACHE_VERSION)]
+        )
+        self.token_table: Optional[set[str]] = None
+        self.phrases: dict[str, Optional[list[str]]] = {}
+        self._sp = None
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if data.get("key") != self.key:
+            # tokens.txt 或 bpe.model 变了，缓存全部失效
+            return
+        self.token_table = set(data.get("tokens", []))
+        self.phrases = data.get("phrases", {})
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = {
+            "key": self.key,
+            "tokens": sorted(self._get_token_table()),
+            "phrases": self.phrases,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _get_token_table(self) -> set[str]:
+        if self.token_table is None:
+            with open(self.tokens, encoding="utf8") as f:
+                self.token_table = {line.split()[0] for line in f if line.strip()}
+            self._dirty = True
+        return self.token_table
+
+    def _get_bpe(self):
+        if self._sp is None:
+            import sentencepiece as spm
+
+            self._sp = spm.SentencePieceProcessor()
+            self._sp.load(self.bpe_model)
+        return self._sp
+
+    def _encode(self, text: str) -> Optional[list[str]]:
+        """编码一个短语，包含不在 token 表中的 token 时返回 None"""
+        if self.tokens_type != "cjkchar+bpe":
+            # 其他编码方式直接交给 sherpa_onnx
+            result = text2token(
+                [text],
+                tokens=self.tokens,
+                tokens_type=self.tokens_type,
+                bpe_model=self.bpe_model,
+            )
+            return list(result[0]) if result else None
+
+        pieces = []
+        for chunk in CJK_PATTERN.split(text):
+            if not chunk.strip():
+                continue
+            if CJK_PATTERN.fullmatch(chunk):
+                pieces.append(chunk)
+            else:
+                pieces += self._get_bpe().encode_as_pieces(chunk)
+        token_table = self._get_token_table()
+        if any(piece not in token_table for piece in pieces):
+            return None
+        return pieces
+
+    def encode(self, texts: list[str]) -> list[Optional[list[str]]]:
+        """编码多个短语，只处理缓存中没有的"""
+        results = []
+        for text in texts:
+            if text not in self.phrases:
+                self.phrases[text] = self._encode(text)
+                self._dirty = True
+            results.append(self.phrases[text])
+        return results
+
+
+def to_keyword_line(tokens: list[str]) -> str:
+    """token 列表 -> keywords.txt 中的一行"""
+    line = "".join(tokens)
+    if re.match(r"^[▁A-Z\s]+$", line):
+        return " ".join(tokens)
+    return " ".join(tokens) + f" @{line}"
+
+
+def compile_keywords(
+    keywords: list[str],
+    tokens: Optional[str] = None,
+    tokens_type: str = "cjkchar+bpe",
+    bpe_model: Optional[str] = None,
+    cache_path: Optional[str] = None,
+) -> list[str]:
+    """
+    把唤醒词编码为 keywords.txt 格式的行（使用持久化缓存）
+
+    可以直接交给 SherpaOnnx.update_keywords，在运行中替换唤醒词。
+    包含未知 token 的唤醒词会被跳过。
+    """
+    cache = KeywordCache(
+        tokens or get_model_file_path("tokens.txt"),
+        tokens_type,
+        bpe_model or get_model_file_path("bpe.model"),
+        cache_path,
+    )
+    texts = [keyword.upper() for keyword in keywords]
+    lines = []
+    for text, encoded in zip(texts, cache.encode(texts)):
+        if encoded is None:
+            print(f"唤醒词中有不支持的字符，已跳过: {text}")
+            continue
+        lines.append(to_keyword_line(encoded))
+    try:
+        cache.save()
+    except Exception as e:
+        # 缓存只影响下次生成的速度，保存失败不影响结果
+        print(f"⚠️ 无法保存唤醒词缓存 {cache.path}: {e}")
+    return lines
+
 
 def get_args():
     tokens_type = "cjkchar+bpe"
@@ -27,25 +191,20 @@ def get_args():
     bpe_model = get_model_file_path("bpe.model")
     output = get_model_file_path("keywords.txt")
     keywords = APP_CONFIG["wakeup"]["keywords"]
-    texts = [f"{keyword.upper()}" for keyword in keywords]
     return locals()
 
 
 def main():
     args = get_args()
-    encoded_texts = text2token(
-        args["texts"],
+    lines = compile_keywords(
+        args["keywords"],
         tokens=args["tokens"],
         tokens_type=args["tokens_type"],
         bpe_model=args["bpe_model"],
     )
     with open(args["output"], "w", encoding="utf8") as f:
-        for _, txt in enumerate(encoded_texts):
-            line = "".join(txt)
-            if re.match(r"^[▁A-Z\s]+$", line):
-                f.write(" ".join(txt) + "\n")
-            else:
-                f.write(" ".join(txt) + f" @{line}" + "\n")
+        for line in lines:
+            f.write(line + "\n")
 
 
 if __name__ == "__main__":
@@ -1,10 +1,50 @@
+import threading
+from typing import Optional
+
 import numpy as np
 import sherpa_onnx
 
 from xiaozhi.utils.file import get_model_file_path
 
 
+def format_keyword(
+    line: str, boost: Optional[float] = None, threshold: Optional[float] = None
+) -> str:
+    """
+    给 keywords.txt 格式的一行加上默认的 boost（:）和触发阈值（#）
+
+    行内已经指定的参数优先，例如 "你 好 小 智 :2.0 #0.25 @你好小智"
+    """
+    parts = line.split()
+    tokens = [part for part in parts if part[0] not in ":#@"]
+    options = {part[0]: part for part in parts if part[0] in ":#@"}
+    if boost is not None:
+        options.setdefault(":", f":{boost}")
+    if threshold is not None:
+        options.setdefault("#", f"#{threshold}")
+    return " ".join(tokens + [options[key] for key in ":#@" if key in options])
+
+
+def keyword_names(line: str) -> set[str]:
+    """唤醒词被识别后可能返回的名字：@ 后面的短语，没有时为拼接后的 token"""
+    parts = line.split()
+    names = {part[1:].lower() for part in parts if part[0] == "@"}
+    if not names:
+        tokens = [part for part in parts if part[0] not in ":#@"]
+        text = "".join(tokens).lower()
+        names = {text, text.replace("▁", " ").strip()}
+    return names
+
+
 class _SherpaOnnx:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keyword_spotter = None
+        self.stream = None
+        # 运行时设置的唤醒词（keywords.txt 格式的行），None 表示只使用 keywords.txt
+        self.keywords: Optional[list[str]] = None
+        self.names: Optional[set[str]] = None
+
     def start(self):
         self.keyword_spotter = sherpa_onnx.KeywordSpotter(
             provider="cpu",
@@ -19,18 +59,77 @@ class _SherpaOnnx:
             decoder=get_model_file_path("decoder.onnx"),
             joiner=get_model_file_path("joiner.onnx"),
         )
-        self.stream = self.keyword_spotter.create_stream()
+        with self.lock:
+            self.stream = self._create_stream(self.keywords)
+
+    def _create_stream(self, keywords: Optional[list[str]]):
+        if keywords is None:
+            return self.keyword_spotter.create_stream()
+        # 每个 stream 可以带上自己的唤醒词，只需要重新构建解码图，不用重新加载模型
+        stream = self.keyword_spotter.create_stream("/".join(keywords))
+        if stream is None:
+            raise ValueError(f"无法解析唤醒词: {keywords}")
+        return stream
+
+    def update_keywords(
+        self,
+        keywords: list[str],
+        boost: Optional[float] = None,
+        threshold: Optional[float] = None,
+    ):
+        """
+        运行时替换唤醒词（不重新加载模型）
+
+        参数:
+            keywords: keywords.txt 格式的行，每行可以单独指定 boost（:）和阈值（#）
+            boost: 没有单独指定时使用的 boost
+            threshold: 没有单独指定时使用的触发阈值
+
+        keywords.txt 中的唤醒词仍然在解码图中，但不在新列表中的唤醒词不会再触发。
+        """
+        lines = [
+            format_keyword(line, boost, threshold)
+            for line in keywords
+            if line.strip()
+        ]
+        if not lines:
+            raise ValueError("唤醒词列表不能为空")
+        names = set().union(*(keyword_names(line) for line in lines))
+
+        stream = None
+        if self.keyword_spotter:
+            # 构建新的 stream 时不持有锁，检测线程不会被阻塞
+            stream = self._create_stream(lines)
+        with self.lock:
+            self.keywords = lines
+            self.names = names
+            if stream is not None:
+                self.stream = stream
+
+    def reload_keywords(self, path: Optional[str] = None, **options):
+        """从 keywords.txt（或指定的文件）重新加载唤醒词"""
+        with open(path or get_model_file_path("keywords.txt"), encoding="utf8") as f:
+            self.update_keywords(f.read().splitlines(), **options)
 
     def kws(self, frames):
         samples = np.frombuffer(frames, dtype=np.int16)
         samples = samples.astype(np.float32) / 32768.0
-        self.stream.accept_waveform(16000, samples)
-        while self.keyword_spotter.is_ready(self.stream):
-            self.keyword_spotter.decode_stream(self.stream)
-            result = self.keyword_spotter.get_result(self.stream)
+        return self.kws_samples(samples)
+
+    def kws_samples(self, samples: np.ndarray):
+        """输入已经转换为 float32 的音频"""
+        with self.lock:
+            # 唤醒词被替换后，从下一块音频开始使用新的 stream
+            stream, names = self.stream, self.names
+        stream.accept_waveform(16000, samples)
+        while self.keyword_spotter.is_ready(stream):
+            self.keyword_spotter.decode_stream(stream)
+            result = self.keyword_spotter.get_result(stream)
             if result:
-                self.keyword_spotter.reset_stream(self.stream)
-                return result.lower()
+                self.keyword_spotter.reset_stream(stream)
+                result = result.lower()
+                if names is None or result in names:
+                    return result
 
 
 SherpaOnnx = _SherpaOnnx()
@@ -0,0 +1,130 @@
+import ctypes
+from typing import Iterator
+
+import opuslib_next as opuslib
+from opuslib_next.api import c_int16_pointer
+from opuslib_next.api.encoder import libopus_encode
+
+from config import APP_CONFIG
+from xiaozhi.services.protocols.typing import AudioConfig
+
+# 单个 Opus 包的最大字节数（libopus 推荐值）
+MAX_PACKET_SIZE = 4000
+
+APPLICATIONS = {
+    "voip": opuslib.APPLICATION_VOIP,
+    "audio": opuslib.APPLICATION_AUDIO,
+    "lowdelay": opuslib.APPLICATION_RESTRICTED_LOWDELAY,
+}
+
+FRAME_DURATIONS = (20, 40, 60)
+
+# 默认的编码参数（与 libopus 的默认值一致）
+DEFAULT_PROFILE = {
+    "application": "audio",
+    "bitrate": None,  # None 表示由 libopus 自动决定
+    "complexity": 10,
+    "dtx": False,
+    "inband_fec": False,
+    "frame_duration": AudioConfig.FRAME_DURATION,
+}
+
+
+def get_encoder_profile(profile: dict = None) -> dict:
+    """上行 Opus 编码参数，未指定时读取 APP_CONFIG["opus"]"""
+    if profile is None:
+        profile = APP_CONFIG.get("opus", {})
+    profile = {**DEFAULT_PROFILE, **profile}
+    if profile["application"] not in APPLICATIONS:
+        raise ValueError(f"Unsupported opus application: {profile['application']}")
+    if profile["frame_duration"] not in FRAME_DURATIONS:
+        raise ValueError(f"Unsupported frame duration: {profile['frame_duration']}")
+    return profile
+
+
+def create_encoder(
+    profile: dict = None,
+    sample_rate: int = AudioConfig.SAMPLE_RATE,
+    channels: int = AudioConfig.CHANNELS,
+) -> opuslib.Encoder:
+    """按编码参数创建 Opus 编码器"""
+    profile = get_encoder_profile(profile)
+    encoder = opuslib.Encoder(
+        fs=sample_rate,
+        channels=channels,
+        application=APPLICATIONS[profile["application"]],
+    )
+    if profile["bitrate"]:
+        encoder.bitrate = profile["bitrate"]
+    encoder.complexity = profile["complexity"]
+    encoder.dtx = int(profile["dtx"])
+    encoder.inband_fec = int(profile["inband_fec"])
+    return encoder
+
+
+def get_frame_size(profile: dict = None, sample_rate=AudioConfig.SAMPLE_RATE) -> int:
+    """每帧的采样点数"""
+    return int(sample_rate * get_encoder_profile(profile)["frame_duration"] / 1000)
+
+
+class OpusFrameEncoder:
+    """
+    增量 Opus 编码器
+
+    输入的 PCM 依次拷贝到一个定长的帧缓冲区中，凑满一帧就直接在缓冲区上编码，
+    不足一帧的部分留到下一次。编码的开销与输入长度成线性关系，除了输出的 Opus 包之外不会产生新的内存分配。
+    """
+
+    def __init__(
+        self,
+        encoder: opuslib.Encoder,
+        frame_size: int = AudioConfig.FRAME_SIZE,
+        channels: int = AudioConfig.CHANNELS,
+    ):
+        self.encoder = encoder
+        self.frame_size = frame_size
+        self.frame_bytes = frame_size * channels * 2
+        self._frame = bytearray(self.frame_bytes)
+        self._frame_view = memoryview(self._frame)
+        self._size = 0
+        # 编码时直接把帧缓冲区和输出缓冲区的指针交给 libopus
+        self._pcm_pointer = ctypes.cast(
+            (ctypes.c_char * self.frame_bytes).from_buffer(self._frame),
+            c_int16_pointer,
+        )
+        self._packet = (ctypes.c_char * MAX_PACKET_SIZE)()
+
+    @property
+    def pending(self) -> int:
+        """帧缓冲区中还未编码的字节数"""
+        return self._size
+
+    def reset(self):
+        """丢弃不足一帧的 PCM"""
+        self._size = 0
+
+    def _encode_frame(self) -> bytes:
+        result = libopus_encode(
+            self.encoder.encoder_state,
+            self._pcm_pointer,
+            self.frame_size,
+            self._packet,
+            MAX_PACKET_SIZE,
+        )
+        if result < 0:
+            raise opuslib.OpusError(result)
+        return ctypes.string_at(self._packet, result)
+
+    def encode(self, data) -> Iterator[bytes]:
+        """写入 PCM，每凑满一帧就产出一个 Opus 包"""
+        view = memoryview(data).cast("B")
+        offset = 0
+        while offset < len(view):
+            num_bytes = min(self.frame_bytes - self._size, len(view) - offset)
+            end = self._size + num_bytes
+            self._frame_view[self._size : end] = view[offset : offset + num_bytes]
+            self._size = end
+            offset += num_bytes
+            if self._size == self.frame_bytes:
+                self._size = 0
+                yield self._encode_frame()
@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+
+
+def init_project_context():
+    """动态导入父模块"""
+    import os
+    import sys
+
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../.."))
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+
+init_project_context()
+
+from xiaozhi.services.audio.opus import (
+    OpusFrameEncoder,
+    create_encoder,
+    get_encoder_profile,
+    get_frame_size,
+)
+from xiaozhi.services.protocols.typing import AudioConfig
+
+SAMPLE_RATE = AudioConfig.SAMPLE_RATE
+DURATION = 30  # 秒
+
+# 对比的编码参数，最后一项为当前配置
+PROFILES = {
+    "audio-默认": {"application": "audio"},
+    "voip-60ms": {"application": "voip", "bitrate": 24000, "complexity": 5},
+    "voip-60ms-dtx": {
+        "application": "voip",
+        "bitrate": 24000,
+        "complexity": 5,
+        "dtx": True,
+    },
+    "voip-20ms-dtx": {
+        "application": "voip",
+        "bitrate": 24000,
+        "complexity": 5,
+        "dtx": True,
+        "frame_duration": 20,
+    },
+    "voip-低复杂度": {
+        "application": "voip",
+        "bitrate": 16000,
+        "complexity": 2,
+        "dtx": True,
+    },
+}
+
+
+def make_audio(duration=DURATION):
+    """生成测试音频：带谐波的间断语音 + 底噪（一半时间为静音）"""
+    rng = np.random.default_rng(0)
+    t = np.arange(SAMPLE_RATE * duration) / SAMPLE_RATE
+    pitch = 150 + 30 * np.sin(2 * np.pi * 3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    voice *= np.sin(2 * np.pi * 0.25 * t) > 0
+    audio = voice * 6000 + rng.standard_normal(len(t)) * 100
+    return audio.astype(np.int16)
+
+
+def bench(profile: dict, audio: np.ndarray):
+    """返回 (每帧编码耗时（微秒）, 码率（字节/秒）, 帧时长（ms）)"""
+    profile = get_encoder_profile(profile)
+    encoder = OpusFrameEncoder(create_encoder(profile), get_frame_size(profile))
+    list(encoder.encode(audio[:SAMPLE_RATE]))  # 预热
+
+    encoder = OpusFrameEncoder(create_encoder(profile), get_frame_size(profile))
+    start = time.perf_counter()
+    packets = list(encoder.encode(audio))
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(len(packet) for packet in packets)
+    duration = len(audio) / SAMPLE_RATE
+    return (
+        elapsed * 1e6 / len(packets),
+        total_bytes / duration,
+        profile["frame_duration"],
+    )
+
+
+def main():
+    audio = make_audio()
+    profiles = {**PROFILES, "当前配置": get_encoder_profile()}
+    for name, profile in profiles.items():
+        per_frame, bytes_per_second, frame_duration = bench(profile, audio)
+        print(
+            f"{name:>12}: {per_frame:7.1f} 微秒/帧 ({frame_duration}ms), "
+            f"{bytes_per_second:7.0f} 字节/秒"
+        )
+
+
+if __name__ == "__main__":
+    main()
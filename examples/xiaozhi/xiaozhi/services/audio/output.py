@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from config import APP_CONFIG
+
+
+class OutputScheduler:
+    """
+    扬声器输出调度器
+
+    任意线程写入解码后的 PCM，由事件循环上唯一一个常驻的发送协程合并成较大的块发给音箱：
+
+    - 合并：队列中攒够 chunk 的音频，或者设备端快播完（不足 min_lead）时才发送
+    - 节奏：按实时速度估算设备端还剩多少音频没播放，最多只提前 lead 发送
+    - 有界队列：积压超过 max_buffer 时丢弃最早的音频，避免在设备上无限堆积
+
+    写入方已经按实时速度输出时（paced，比如抖动缓冲区的播放线程），不再攒块等待，
+    收到就发送，只保留 lead 的上限，避免两层节奏控制叠加额外的延迟。
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], Awaitable],
+        loop: asyncio.AbstractEventLoop,
+        sample_rate: int = 24000,
+        channels: int = 1,
+        lead: float = 300,
+        min_lead: float = 40,
+        chunk: float = 120,
+        max_buffer: float = 1000,
+        paced: bool = False,
+    ):
+        """
+        参数:
+            send: 发送音频的协程函数
+            loop: 发送协程所在的事件循环
+            sample_rate: 采样率
+            channels: 声道数
+            lead: 最多比实时播放提前发送多少音频（ms）
+            min_lead: 设备端剩余的音频少于该值时立即发送（ms）
+            chunk: 每次至少合并多少音频再发送（ms）
+            max_buffer: 队列最多积压多少音频（ms）
+            paced: 写入方是否已经按实时速度输出
+        """
+        self.send = send
+        self.loop = loop
+        self.bytes_per_second = sample_rate * channels * 2
+        self.lead = lead / 1000
+        self.chunk = min(chunk, lead) / 1000
+        self.min_lead = min(min_lead, lead - chunk) / 1000
+        self.max_bytes = int(self.bytes_per_second * max_buffer / 1000)
+        self.paced = paced
+
+        self.lock = threading.Lock()
+        self.queue: deque[bytes] = deque()
+        self.queued_bytes = 0
+        self.played_until = 0  # 已发送的音频预计播放完的时间（monotonic）
+        self._waiting = False
+        self._wakeup = None
+        self.task = None
+        self.metrics = {
+            "writes": 0,  # 写入次数
+            "sends": 0,  # 实际发送次数
+            "dropped_bytes": 0,  # 队列溢出丢弃的字节数
+            "send_errors": 0,  # 发送失败的次数
+        }
+        loop.call_soon_threadsafe(self._start)
+
+    @classmethod
+    def from_config(cls, send, loop):
+        config = APP_CONFIG.get("output", {})
+        return cls(
+            send,
+            loop,
+            sample_rate=config.get("sample_rate", 24000),
+            lead=config.get("lead", 300),
+            min_lead=config.get("min_lead", 40),
+            chunk=config.get("chunk", 120),
+            max_buffer=config.get("max_buffer", 1000),
+            paced=config.get("paced", True),
+        )
+
+    def _start(self):
+        self._wakeup = asyncio.Event()
+        self.task = self.loop.create_task(self._sender())
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "queued_ms": self.queued_bytes * 1000 / self.bytes_per_second,
+            "ahead_ms": max(self.played_until - time.monotonic(), 0) * 1000,
+        }
+
+    def write(self, data: bytes):
+        """写入 PCM（线程安全）"""
+        with self.lock:
+            self.queue.append(data)
+            self.queued_bytes += len(data)
+            self.metrics["writes"] += 1
+            while self.queued_bytes > self.max_bytes and len(self.queue) > 1:
+                dropped = self.queue.popleft()
+                self.queued_bytes -= len(dropped)
+                self.metrics["dropped_bytes"] += len(dropped)
+            if not self._waiting:
+                return
+            self._waiting = False
+        self.loop.call_soon_threadsafe(self._wakeup.set)
+
+    def clear(self):
+        """丢弃还没发送的音频"""
+        with self.lock:
+            self.queue.clear()
+            self.queued_bytes = 0
+
+    def _take(self, max_bytes: int) -> bytes:
+        """从队列中取出不超过 max_bytes 的音频（至少一块）"""
+        with self.lock:
+            chunks = []
+            size = 0
+            while self.queue and (
+                not chunks or size + len(self.queue[0]) <= max_bytes
+            ):
+                chunk = self.queue.popleft()
+                chunks.append(chunk)
+                size += len(chunk)
+            self.queued_bytes -= size
+            return b"".join(chunks)
+
+    async def _wait_for_data(self):
+        while True:
+            with self.lock:
+                if self.queue:
+                    return
+                self._waiting = True
+                self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def _ahead(self) -> float:
+        """设备端还没播放的音频时长（秒）"""
+        return max(self.played_until - time.monotonic(), 0)
+
+    def _send_delay(self):
+        """还要等多久再发送（秒），设备端空闲时返回 None"""
+        ahead = self._ahead()
+        queued = self.queued_bytes / self.bytes_per_second
+        if self.paced:
+            # 只要不超过 lead 就立即发送
+            return ahead - (self.lead - min(queued, self.chunk))
+        if ahead == 0:
+            if queued >= self.chunk + self.min_lead:
+                return 0
+            return None
+        if queued >= self.chunk:
+            # 攒够一块后，等设备端腾出一块的空间
+            return min(ahead - self.min_lead, ahead - (self.lead - self.chunk))
+        return min(ahead - self.min_lead, self.chunk - queued)
+
+    async def _sender(self):
+        while True:
+            await self._wait_for_data()
+
+            # 设备端还有足够的音频时先等一等，攒成更大的块再发送
+            deadline = None
+            while True:
+                wait = self._send_delay()
+                if wait is None:
+                    # 设备端空闲：最多等待 chunk + min_lead，攒够再开始播放
+                    now = time.monotonic()
+                    deadline = deadline or now + self.chunk + self.min_lead
+                    wait = deadline - now
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            max_bytes = int((self.lead - self._ahead()) * self.bytes_per_second)
+            data = self._take(max_bytes)
+            if not data:
+                continue
+            try:
+                await self.send(data)
+            except Exception:
+                self.metrics["send_errors"] += 1
+                continue
+            self.metrics["sends"] += 1
+            duration = len(data) / self.bytes_per_second
+            self.played_until = max(self.played_until, time.monotonic()) + duration
@@ -0,0 +1,68 @@
+from math import gcd
+
+import numpy as np
+
+
+class Resampler:
+    """
+    多相 FIR 重采样（int16 单声道，支持任意整数采样率之比）
+
+    - 把 src_rate -> dst_rate 化成 up / down 的有理数比例，低通滤波器按相位拆成 up 组
+    - 每个输出点只计算它所在相位的 taps 个乘加，一块音频的所有输出点一次向量化算完
+    - 块与块之间保留输入历史和相位，连续处理流式音频不会产生接缝
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int, taps: int = 16):
+        """
+        参数:
+            src_rate: 输入采样率
+            dst_rate: 输出采样率
+            taps: 每个相位的滤波器长度，越长阻带衰减越好、计算量越大
+        """
+        divisor = gcd(src_rate, dst_rate)
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.up = dst_rate // divisor
+        self.down = src_rate // divisor
+        self.taps = taps
+
+        # 设计低通滤波器（Kaiser 窗 sinc），截止频率取两个采样率中较低的奈奎斯特频率
+        length = self.up * taps
+        cutoff = 0.5 / max(self.up, self.down) * 0.9
+        n = np.arange(length) - (length - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, 8.0)
+        h *= self.up / h.sum()  # 补偿插零上采样带来的增益损失
+
+        # phases[p, m] = h[p + (taps - 1 - m) * up]，与升序的输入窗口直接点乘
+        self.phases = np.ascontiguousarray(
+            h.reshape(taps, self.up).T[:, ::-1], dtype=np.float32
+        )
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._pos = 0  # 下一个输出点在上采样序列中的位置（相对于下一块输入的开头）
+
+    def process(self, pcm) -> bytes:
+        """重采样一块 int16 PCM"""
+        if self.up == self.down:
+            return bytes(pcm)
+
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        extended = np.concatenate([self._history, samples.astype(np.float32)])
+        self._history = extended[-(self.taps - 1) :]
+
+        total = len(samples) * self.up
+        if total <= self._pos:
+            self._pos -= total
+            return b""
+
+        count = (total - self._pos + self.down - 1) // self.down
+        k = self._pos + np.arange(count, dtype=np.int64) * self.down
+        index, phase = np.divmod(k, self.up)
+        self._pos = int(k[-1]) + self.down - total
+
+        windows = np.lib.stride_tricks.sliding_window_view(extended, self.taps)
+        output = np.einsum("ij,ij->i", windows[index], self.phases[phase])
+        np.clip(output, -32768, 32767, out=output)
+        return output.astype(np.int16).tobytes()
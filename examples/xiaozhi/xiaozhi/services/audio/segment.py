@@ -0,0 +1,65 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Optional, Union
+
+
+@dataclass
+class SpeechStart:
+    """开始说话：frames 为说话前的静音片段 + 已检测到的语音"""
+
+    frames: bytes
+
+
+@dataclass
+class SpeechFrames:
+    """说话中的音频"""
+
+    frames: bytes
+
+
+@dataclass
+class SpeechEnd:
+    """说话结束"""
+
+
+SpeechSegment = Union[SpeechStart, SpeechFrames, SpeechEnd]
+
+
+class SegmentStream:
+    """
+    流式 VAD 的语音片段事件流
+
+    检测线程通过 put 写入事件，事件循环中通过 async for 消费；关闭后迭代结束。
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue[Optional[SpeechSegment]] = asyncio.Queue()
+        self.closed = False
+
+    def put(self, event: SpeechSegment):
+        if self.closed:
+            return
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> SpeechSegment:
+        event = await self.queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    async def next(self, timeout=None) -> Optional[SpeechSegment]:
+        """等待下一个事件，超时或已关闭时返回 None"""
+        try:
+            return await asyncio.wait_for(self.__anext__(), timeout)
+        except (asyncio.TimeoutError, StopAsyncIteration):
+            return None
@@ -1,10 +1,104 @@
+import asyncio
+import threading
 import uuid
-from typing import Any, Callable, ClassVar, Optional
+from typing import Any, Callable, ClassVar, Literal, Optional
 
 import numpy as np
 
 from config import APP_CONFIG
 from xiaozhi.ref import get_xiaoai
+from xiaozhi.services.audio.gain import GainStage
+from xiaozhi.services.protocols.typing import AudioConfig
+
+OverflowPolicy = Literal["drop_oldest", "drop_all"]
+
+
+class RingBuffer:
+    """
+    定长 int16 环形缓冲区（单写多读）
+
+    写入方只有一个，按绝对位置 write_pos 追加；每个读取方通过 RingReader 持有自己的游标。
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.write_pos = 0  # 累计写入的采样点数
+        self.last_write = 0  # 最近一次写入的采样点数
+        self._buffer = np.zeros(capacity, dtype=np.int16)
+
+    def write(self, samples: np.ndarray) -> None:
+        num_samples = len(samples)
+        if num_samples == 0:
+            return
+        if num_samples > self.capacity:
+            self.write_pos += num_samples - self.capacity
+            samples = samples[-self.capacity :]
+            num_samples = self.capacity
+
+        start = self.write_pos % self.capacity
+        first = min(num_samples, self.capacity - start)
+        self._buffer[start : start + first] = samples[:first]
+        self._buffer[: num_samples - first] = samples[first:]
+        self.write_pos += num_samples
+        self.last_write = num_samples
+
+    def clear(self) -> None:
+        self.write_pos = 0
+        self.last_write = 0
+
+    def copy_to(self, pos: int, num_samples: int, out: np.ndarray) -> None:
+        """把绝对位置 pos 开始的 num_samples 个采样点拷贝到 out"""
+        start = pos % self.capacity
+        first = min(num_samples, self.capacity - start)
+        out[:first] = self._buffer[start : start + first]
+        out[first:num_samples] = self._buffer[: num_samples - first]
+
+
+class RingReader:
+    """
+    RingBuffer 的读取游标
+
+    读取结果复用预分配的输出缓冲区，不会产生新的内存分配。
+
+    溢出策略（读取速度跟不上写入速度时）:
+        - drop_oldest: 丢弃最早的音频，保留最新的 capacity 个采样点
+        - drop_all: 清空积压的音频，只保留最近一次写入的数据
+    """
+
+    def __init__(self, ring: RingBuffer, overflow: OverflowPolicy = "drop_oldest"):
+        if overflow not in ("drop_oldest", "drop_all"):
+            raise ValueError(f"Unsupported overflow policy: {overflow}")
+        self.ring = ring
+        self.overflow = overflow
+        self.overflowed = False
+        self.cursor = ring.write_pos
+        self._output = np.zeros(ring.capacity, dtype=np.int16)
+
+    def __len__(self) -> int:
+        backlog = self.ring.write_pos - self.cursor
+        if backlog > self.ring.capacity:
+            self.overflowed = True
+            if self.overflow == "drop_all":
+                self.cursor = self.ring.write_pos - self.ring.last_write
+            else:
+                self.cursor = self.ring.write_pos - self.ring.capacity
+            backlog = self.ring.write_pos - self.cursor
+        return backlog
+
+    def clear(self) -> None:
+        self.cursor = self.ring.write_pos
+        self.overflowed = False
+
+    def read(self, num_samples: int) -> memoryview:
+        """
+        读取并消费 num_samples 个采样点
+
+        返回的 memoryview 指向内部输出缓冲区，在下一次 read 之前有效。
+        """
+        num_samples = min(num_samples, len(self))
+        self.ring.copy_to(self.cursor, num_samples, self._output)
+        self.cursor += num_samples
+        return memoryview(self._output[:num_samples]).cast("B")
 
 
 class __GlobalStream:
@@ -12,17 +106,38 @@ class __GlobalStream:
         self.readers = {}
         self.on_output_data = None
 
+        # 所有读取方共享同一个录音缓冲区，转换和增益只计算一次
+        config = APP_CONFIG.get("stream", {})
+        self.gain = GainStage.from_config()
+        self.lock = threading.Lock()
+        self.data_arrived = threading.Condition(self.lock)
+        self.ring = RingBuffer(
+            int(AudioConfig.SAMPLE_RATE * config.get("buffer_duration", 5))
+        )
+
     def register_reader(self, reader):
-        if reader.id not in self.readers:
-            self.readers[reader.id] = reader
+        # input 在录音线程中持有锁遍历 readers
+        with self.lock:
+            if reader.id not in self.readers:
+                self.readers[reader.id] = reader
 
     def unregister_reader(self, reader) -> None:
-        if reader.id in self.readers:
-            del self.readers[reader.id]
+        with self.lock:
+            if reader.id in self.readers:
+                del self.readers[reader.id]
 
     def input(self, data: bytes) -> None:
-        for key in self.readers:
-            self.readers[key].input(data)
+        if len(data) == 0 or not self.readers:
+            return
+
+        samples = np.frombuffer(data, dtype=np.int16)
+        with self.lock:
+            # 小爱音箱录音音量较小，需要后期放大一下
+            self.ring.write(self.gain.process(samples))
+            # 唤醒等待数据的读取方
+            self.data_arrived.notify_all()
+            for reader in self.readers.values():
+                reader._notify_waiters()
 
     def output(self, frames: bytes) -> None:
         if self.on_output_data:
@@ -52,7 +167,13 @@ class MyStream:
         self._is_output = output
         self._is_active = False
 
-        self.input_bytes: list[int] = []
+        # 录音读取游标
+        config = APP_CONFIG.get("stream", {})
+        self._reader = RingReader(
+            GlobalStream.ring, overflow=config.get("overflow", "drop_oldest")
+        )
+        # 等待数据的异步读取方 (采样点数, future)
+        self._waiters: list[tuple[int, asyncio.Future]] = []
 
         if start:
             self.start_stream()
@@ -65,16 +186,31 @@ class MyStream:
 
     def start_stream(self) -> None:
         if not self._is_active:
-            self._is_active = True
+            with GlobalStream.lock:
+                self._is_active = True
+                if self._is_input:
+                    self._reader.clear()
+                # 唤醒等待音频流启动的读取方
+                self._wake_all()
             if self._is_input:
                 GlobalStream.register_reader(self)
 
     def stop_stream(self) -> None:
         if self._is_active:
-            self._is_active = False
             if self._is_input:
                 GlobalStream.unregister_reader(self)
-                self.input_bytes.clear()
+            with GlobalStream.lock:
+                self._is_active = False
+                # 已经注销的读取方收不到新数据，正在等待的读取直接返回空字节
+                self._wake_all()
+
+    def _wake_all(self) -> None:
+        """唤醒所有等待中的读取方（调用方需持有 GlobalStream.lock）"""
+        GlobalStream.data_arrived.notify_all()
+        for _, future in self._waiters:
+            if not future.done():
+                future.get_loop().call_soon_threadsafe(_resolve_future, future)
+        self._waiters = []
 
     def write(self, frames: bytes) -> None:
         # 发送输出音频流到扬声器
@@ -82,36 +218,133 @@ class MyStream:
             return
         GlobalStream.output(frames)
 
-    def input(self, data: bytes):
-        # 收到麦克风输入音频流
+    def get_read_available(self) -> int:
+        """当前可读取的帧数"""
         if not self._is_input or not self._is_active:
-            return
+            return 0
+        with GlobalStream.lock:
+            return len(self._reader) // self._channels
 
-        if len(data) > 0:
-            samples = np.frombuffer(data, dtype=np.int16)
-            # 小爱音箱录音音量较小，需要后期放大一下
-            samples = samples * APP_CONFIG["vad"]["boost"]
-            self.input_bytes.extend(samples.tobytes())
+    def _readable(self, num_samples: int) -> bool:
+        return self._is_active and len(self._reader) >= max(num_samples, 1)
+
+    def _read_locked(self, num_frames, exception_on_overflow) -> bytes:
+        if not self._is_active:
+            return b""
+
+        available = len(self._reader)
+        if exception_on_overflow and self._reader.overflowed:
+            self._reader.overflowed = False
+            raise IOError("Input overflowed")
+        self._reader.overflowed = False
 
-    def read(self, num_frames=None, exception_on_overflow=False) -> bytes:
         if num_frames is None:
-            data = bytes(self.input_bytes)
-            self.input_bytes.clear()
-            return data
-
-        num_frames = num_frames * 2
-        if (
-            not self._is_input
-            or not self._is_active
-            # 达不到预期长度时，返回空字节，等待下一次读取
-            or len(self.input_bytes) < num_frames
-        ):
-            return bytes([])
-
-        data = bytes(self.input_bytes[:num_frames])
-        self.input_bytes = self.input_bytes[num_frames:]
-
-        return data
+            return bytes(self._reader.read(available))
+
+        num_samples = num_frames * self._channels
+        # 达不到预期长度时，返回空字节，等待下一次读取
+        if available < num_samples:
+            return b""
+
+        # 与 PyAudio 一样返回 bytes，调用方可以放心长期持有
+        return bytes(self._reader.read(num_samples))
+
+    def _notify_waiters(self) -> None:
+        """收到新数据时，唤醒已经可以读取的异步读取方（调用方需持有 GlobalStream.lock）"""
+        if not self._waiters:
+            return
+
+        pending = []
+        for num_samples, future in self._waiters:
+            if future.done():
+                continue
+            if self._readable(num_samples):
+                future.get_loop().call_soon_threadsafe(_resolve_future, future)
+            else:
+                pending.append((num_samples, future))
+        self._waiters = pending
+
+    def wait(self, num_frames=None, timeout=None) -> bool:
+        """
+        阻塞等待，直到可以读取 num_frames 帧（None 表示有任意数据即可）
+
+        参数:
+            timeout: 最长等待时间（秒），None 表示一直等待
+        """
+        num_samples = (num_frames or 0) * self._channels
+        with GlobalStream.data_arrived:
+            GlobalStream.data_arrived.wait_for(
+                lambda: not self._is_active or self._readable(num_samples),
+                timeout=timeout,
+            )
+            return self._readable(num_samples)
+
+    def wait_active(self, timeout=None) -> bool:
+        """阻塞等待，直到音频流被启动（start_stream）"""
+        with GlobalStream.data_arrived:
+            return GlobalStream.data_arrived.wait_for(
+                lambda: self._is_active, timeout=timeout
+            )
+
+    async def await_active(self) -> None:
+        """挂起直到音频流被启动（start_stream）"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with GlobalStream.lock:
+                if self._is_active:
+                    return
+                future = loop.create_future()
+                self._waiters.append((0, future))
+            await future
+
+    def read(self, num_frames=None, exception_on_overflow=False, timeout=0) -> bytes:
+        """
+        读取录音数据（与 PyAudio 的 Stream.read 参数保持一致）
+
+        参数:
+            num_frames: 读取的帧数，None 表示读取当前所有数据
+            exception_on_overflow: 缓冲区溢出时是否抛出 IOError
+            timeout: 数据不足时最长等待多久（秒），0 表示不等待，None 表示一直等待
+
+        音频流已停止（或等待期间被停止）时立即返回空字节。
+        """
+        if not self._is_input:
+            return b""
+
+        num_samples = (num_frames or 0) * self._channels
+        with GlobalStream.data_arrived:
+            if timeout != 0:
+                GlobalStream.data_arrived.wait_for(
+                    lambda: not self._is_active or self._readable(num_samples),
+                    timeout=timeout,
+                )
+            return self._read_locked(num_frames, exception_on_overflow)
+
+    async def aread(self, num_frames=None, exception_on_overflow=False) -> bytes:
+        """
+        异步读取录音数据，数据不足时挂起，直到 GlobalStream 收到足够的数据
+
+        音频流已停止（或挂起期间被停止）时返回空字节，可以用 await_active 等待重新启动。
+        """
+        if not self._is_input:
+            return b""
+
+        loop = asyncio.get_running_loop()
+        num_samples = (num_frames or 0) * self._channels
+        while True:
+            with GlobalStream.lock:
+                if not self._is_active:
+                    return b""
+                if self._readable(num_samples):
+                    return self._read_locked(num_frames, exception_on_overflow)
+                future = loop.create_future()
+                self._waiters.append((num_samples, future))
+            await future
+
+
+def _resolve_future(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
 
 
 class MyAudio:
@@ -1,10 +1,21 @@
+import asyncio
 import threading
 import time
 
+import numpy as np
+
 from config import APP_CONFIG
 from xiaozhi.event import EventManager
-from xiaozhi.ref import set_vad
-from xiaozhi.services.audio.stream import MyAudio
+from xiaozhi.ref import get_xiaoai, set_vad
+from xiaozhi.services.audio.gate import EnergyGate
+from xiaozhi.services.audio.segment import (
+    SegmentStream,
+    SpeechEnd,
+    SpeechFrames,
+    SpeechStart,
+)
+from xiaozhi.services.audio.stream import MyAudio, RingBuffer
+from xiaozhi.services.audio.vad.endpoint import Endpointer
 from xiaozhi.services.audio.vad.silero import Silero
 from xiaozhi.services.protocols.typing import AudioConfig
 from xiaozhi.utils.base import get_env
@@ -22,6 +33,10 @@ class _VAD:
         self.threshold = config.get("threshold", 0.01)
         self.min_speech_duration = config.get("min_speech_duration", 250)
         self.min_silence_duration = config.get("min_silence_duration", 500)
+        self.gate = EnergyGate.from_config()
+        self.endpointer = Endpointer.from_config()
+        # 流式模式：检测到语音后不暂停，直接通过 SegmentStream 持续输出语音片段
+        self.streaming = config.get("streaming", False) and bool(get_env("CLI"))
 
         # 状态变量
         self.paused = True
@@ -33,16 +48,22 @@ class _VAD:
         self.stream = None
 
         # 暂存的语音片段
-        self.silence_frames = []  # 静音片段
-        self.speech_frames = []  # 语音片段
+        self.preroll = RingBuffer(self.sample_rate * 1)  # 说话前 1s 的静音片段
+        self.preroll_output = np.zeros(self.preroll.capacity, dtype=np.int16)
+        self.speech_buffer = bytearray()  # 语音片段
         self.target = None  # 检测目标 speech/silence
+        self.segments = None  # 流式模式下当前会话的语音片段事件流
+        self.in_speech = False  # 流式模式下是否正在说话
+        self.endpointing = False  # 是否由 endpointer 判断说话结束
+        self.detected_speech = 0  # 确认有人说话时已经检测到的语音（采样点数）
 
     def _reset_state(self):
         """重置状态"""
         self.speech_count = 0
         self.silence_count = 0
-        self.speech_frames = []
-        self.silence_frames = []
+        # 之前的语音片段可能已经交给 EventManager，这里换一个新的缓冲区而不是清空
+        self.speech_buffer = bytearray()
+        self.preroll.clear()
 
     def start(self):
         """启动VAD检测器"""
@@ -56,6 +77,16 @@ class _VAD:
         self.thread = threading.Thread(target=self._detection_loop, daemon=True)
         self.thread.start()
 
+    def start_async(self, executor):
+        """在当前事件循环中启动VAD检测（单事件循环模式）"""
+        if not get_env("CLI"):
+            return
+
+        self._initialize_audio_stream()
+
+        self.paused = False
+        asyncio.get_running_loop().create_task(self._detection_task(executor))
+
     def pause(self):
         """暂停VAD检测"""
         if not get_env("CLI"):
@@ -63,38 +94,113 @@ class _VAD:
 
         self.paused = True
         self._reset_state()
-        self.stream.stop_stream()
+        self.close_segments()
+        if self.stream:
+            self.stream.stop_stream()
+
+    def resume(self, target: str, endpoint=False):
+        """
+        恢复VAD检测
 
-    def resume(self, target: str):
-        """恢复VAD检测"""
+        - endpoint: 等待说话结束时使用自适应的 endpointer（需要在配置中开启）
+        """
         if not get_env("CLI"):
             return
 
         self.paused = False
         self.target = target
-        self.stream.start_stream()
+        self._start_endpointing(endpoint)
+        self.gate.reset()
+        if self.stream:
+            self.stream.start_stream()
+
+    def open_segments(self, wait_silence=False) -> SegmentStream:
+        """
+        开始流式检测，返回语音片段事件流（SpeechStart -> SpeechFrames... -> SpeechEnd）
+
+        - wait_silence: 先等待一段静音（比如 TTS 余音）再开始检测语音
+        """
+        self.close_segments()
+        self.segments = SegmentStream(get_xiaoai().async_loop)
+        self.in_speech = False
+        self._reset_state()
+        self.resume("silence" if wait_silence else "speech")
+        return self.segments
+
+    def close_segments(self):
+        """结束流式检测，正在等待事件的消费方会退出迭代"""
+        if self.segments:
+            self.segments.close()
+            self.segments = None
+        self.in_speech = False
+
+    def _start_endpointing(self, enabled: bool):
+        self.endpointing = enabled and self.endpointer.enabled
+        if self.endpointing:
+            # 说话时长从确认有人说话之前就开始算
+            self.endpointer.start(self.detected_speech)
+            self.detected_speech = 0
+
+    def _is_endpoint(self, frames, speech_prob: float) -> bool:
+        """是否已经说完（endpointer 判断时记录本次等待的静音时长）"""
+        if self.endpointing:
+            if not self.endpointer.update(frames, speech_prob):
+                return False
+            self.endpointer.record(EventManager.session_id)
+            return True
+
+        if speech_prob >= self.threshold:
+            self.silence_count = 0
+            return False
+        self.silence_count += len(frames)
+        return self.silence_count > self.min_silence_duration * self.sample_rate / 1000
+
+    def _start_segment(self):
+        """流式模式：开始说话，把说话前的静音片段和已检测到的语音一起交出去"""
+        self.in_speech = True
+        self.segments.put(SpeechStart(bytes(self.speech_buffer)))
+        self._reset_state()
+        self._start_endpointing(True)
+
+    def _handle_segment_frame(self, frames, speech_prob: float):
+        """流式模式：说话中的音频帧直接交出去，说完后结束本段语音"""
+        self.segments.put(SpeechFrames(bytes(frames)))
+        if self._is_endpoint(frames, speech_prob):
+            self.in_speech = False
+            self.endpointing = False
+            self._reset_state()
+            self.segments.put(SpeechEnd())
 
     def _handle_speech_frame(self, frames):
         """处理语音帧"""
         self.speech_count += len(frames)
         self.silence_count = 0
 
-        if self.target == "speech":
-            if not self.speech_frames:
-                # 加入静音片段（潜在的语音片段）
-                self.speech_frames.extend(self.silence_frames)
-
-        # 加入语音片段
-        self.speech_frames.extend(frames)
+        if self.target != "speech":
+            return
 
-        speech_bytes = bytes(self.speech_frames)
+        if not self.speech_buffer:
+            # 加入静音片段（潜在的语音片段）
+            num_samples = min(self.preroll.write_pos, self.preroll.capacity)
+            self.preroll.copy_to(
+                self.preroll.write_pos - num_samples,
+                num_samples,
+                self.preroll_output,
+            )
+            self.speech_buffer += self.preroll_output[:num_samples].data
 
-        if (
-            self.target == "speech"
-            and self.speech_count > self.min_speech_duration * self.sample_rate / 1000
-        ):
+        # 加入语音片段
+        self.speech_buffer += frames
+
+        if self.speech_count > self.min_speech_duration * self.sample_rate / 1000:
+            # speech_count 按字节累计，int16 每个采样点 2 字节
+            self.detected_speech = self.speech_count // 2
+            if self.segments:
+                self._start_segment()
+                return
+            speech_buffer = memoryview(self.speech_buffer)
             self.pause()
-            EventManager.on_speech(speech_bytes)
+            EventManager.on_speech(speech_buffer)
 
     def _handle_silence_frame(self, frames):
         """处理静音帧"""
@@ -102,21 +208,22 @@ class _VAD:
         self.speech_count = 0
 
         if self.target == "speech":
-            if not self.speech_frames:
-                # 如果之前没有语音片段，则将当前帧加入静音片段
-                self.silence_frames.extend(frames)
-                # 确保静音片段长度不超过 1s
-                self.silence_frames = self.silence_frames[
-                    -1 * 1 * 2 * self.sample_rate :
-                ]
+            if not self.speech_buffer:
+                # 如果之前没有语音片段，则将当前帧加入静音片段（最多保留 1s）
+                self.preroll.write(np.frombuffer(frames, dtype=np.int16))
             else:
                 # 如果之前有语音片段，则将当前帧加入语音片段
-                self.speech_frames.extend(frames)
+                self.speech_buffer += frames
 
         if (
             self.target == "silence"
             and self.silence_count > self.min_silence_duration * self.sample_rate / 1000
         ):
+            if self.segments:
+                # 流式模式：余音结束后继续检测语音，不暂停
+                self.target = "speech"
+                self._reset_state()
+                return
             self.pause()
             EventManager.on_silence()
 
@@ -156,26 +263,83 @@ class _VAD:
     def _detection_loop(self):
         """VAD检测主循环"""
         while True:
-            # 如果暂停或者音频流未初始化，则跳过
-            if self.paused or not self.stream:
+            # 如果音频流未初始化，则跳过
+            if not self.stream:
                 time.sleep(0.1)
                 continue
 
-            # 读取缓冲区音频数据
-            frames = self.stream.read(self.frame_size)
-            if len(frames) != self.frame_size * 2:
-                time.sleep(0.01)
+            # 暂停时音频流已停止，等到恢复检测
+            if not self.stream.is_active():
+                self.stream.wait_active(timeout=1)
                 continue
 
-            # 检测是否是语音
-            speech_prob = Silero.vad(frames, self.sample_rate) or 0
-            is_speech = speech_prob >= self.threshold
-            if is_speech:
-                self._handle_speech_frame(frames)
-            else:
-                self._handle_silence_frame(frames)
+            # 阻塞读取缓冲区音频数据
+            num_frames = self._backlog_frames()
+            frames = self.stream.read(num_frames, timeout=1)
+            if self.paused or len(frames) != num_frames * 2:
+                continue
+
+            # 一次性检测积压的所有音频
+            speech_probs = self._detect(frames)
+            self._handle_windows(frames, speech_probs)
+
+    async def _detection_task(self, executor):
+        """VAD检测协程，模型推理交给 executor 线程池执行"""
+        loop = asyncio.get_running_loop()
+        while True:
+            # 暂停时音频流已停止，挂起到恢复检测
+            if not self.stream.is_active():
+                await self.stream.await_active()
+                continue
+
+            frames = await self.stream.aread(self._backlog_frames())
+            if self.paused or not frames:
+                continue
 
-            time.sleep(0.01)
+            speech_probs = await loop.run_in_executor(executor, self._detect, frames)
+            self._handle_windows(frames, speech_probs)
+
+    def _detect(self, frames):
+        """能量门限全部关闭时跳过 Silero 推理，整块视为静音"""
+        if not self.gate.is_open(frames, self.frame_size):
+            # 跳过的音频没有送入模型，不能接着之前的循环状态继续推理
+            Silero.reset()
+            return np.zeros(len(frames) // 2 // self.frame_size, dtype=np.float32)
+        return Silero.vad_stream(frames, self.sample_rate)
+
+    def _backlog_frames(self) -> int:
+        """本次读取的帧数：至少一个窗口，有积压时一次读完所有完整窗口"""
+        available = self.stream.get_read_available()
+        return max(self.frame_size, available // self.frame_size * self.frame_size)
+
+    def process(self, frames, speech_probs):
+        """处理共享前端（AcousticFrontend）送来的音频和每个窗口的语音概率"""
+        if not self.paused:
+            self._handle_windows(frames, speech_probs)
+
+    def _handle_windows(self, frames, speech_probs):
+        """逐个窗口处理检测结果"""
+        window_bytes = self.frame_size * 2
+        for idx, speech_prob in enumerate(speech_probs):
+            # 检测到语音/静音后会暂停检测，丢弃剩余的窗口
+            if self.paused:
+                break
+            window = frames[idx * window_bytes : (idx + 1) * window_bytes]
+            self._handle_frames(window, speech_prob)
+
+    def _handle_frames(self, frames, speech_prob: float):
+        """根据语音概率处理音频帧"""
+        is_speech = speech_prob >= self.threshold
+        if self.in_speech and self.segments:
+            self._handle_segment_frame(frames, speech_prob)
+        elif self.endpointing and self.target == "silence":
+            if self._is_endpoint(frames, speech_prob):
+                self.pause()
+                EventManager.on_silence()
+        elif is_speech:
+            self._handle_speech_frame(frames)
+        else:
+            self._handle_silence_frame(frames)
 
 
 VAD = _VAD()
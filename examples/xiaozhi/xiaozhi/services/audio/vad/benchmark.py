@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+
+
+def init_project_context():
+    """动态导入父模块"""
+    import os
+    import sys
+
+    project_root = os.path.abspath(
+        os.path.join(os.path.dirname(__file__), "../../../..")
+    )
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+
+
+init_project_context()
+
+from xiaozhi.services.audio.vad.silero import OnnxWrapper
+from xiaozhi.utils.file import get_model_file_path
+
+SAMPLE_RATE = 16000
+WINDOW_SIZE = 512
+DURATION = 60  # 秒
+
+
+def make_audio(duration=DURATION):
+    """生成测试音频：白噪音 + 间断的正弦波"""
+    rng = np.random.default_rng(0)
+    t = np.arange(SAMPLE_RATE * duration) / SAMPLE_RATE
+    tone = np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.25 * t) > 0)
+    audio = tone * 8000 + rng.standard_normal(len(t)) * 300
+    return audio.astype(np.int16)
+
+
+def bench_call(model: OnnxWrapper, audio: np.ndarray):
+    """逐窗口调用 __call__（每帧都会分配新的输入/输出数组）"""
+    model.reset_states()
+    for i in range(0, len(audio) - WINDOW_SIZE + 1, WINDOW_SIZE):
+        window = audio[i : i + WINDOW_SIZE].astype(np.float32) / 32768.0
+        model(window, SAMPLE_RATE)
+
+
+def bench_stream(model: OnnxWrapper, audio: np.ndarray):
+    """预分配缓冲区 + IO binding 的流式接口"""
+    model.reset_stream(SAMPLE_RATE)
+    model.stream(audio, SAMPLE_RATE)
+
+
+def main():
+    model = OnnxWrapper(get_model_file_path("silero_vad.onnx"))
+    audio = make_audio()
+    num_frames = len(audio) // WINDOW_SIZE
+    print(f"IO binding: {'开启' if model._bindings else '不可用'}")
+    for name, bench in [("__call__", bench_call), ("stream", bench_stream)]:
+        bench(model, audio[: SAMPLE_RATE])  # 预热
+        start = time.perf_counter()
+        bench(model, audio)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:>8}: {num_frames / elapsed:8.0f} 帧/秒, "
+            f"{elapsed * 1e6 / num_frames:6.1f} 微秒/帧"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import math
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from config import APP_CONFIG
+from xiaozhi.services.audio.stream import RingBuffer
+from xiaozhi.services.protocols.typing import AudioConfig
+
+# 尾部上下文模型：输入最近一段 int16 音频，返回这句话已经说完的概率（0-1）
+TrailingModel = Callable[[np.ndarray], float]
+
+
+class Endpointer:
+    """
+    自适应的说话结束检测
+
+    固定等待 min_silence_duration 的静音会给每一轮对话都加上同样的延迟。
+    这里根据以下信息估计“这句话已经说完”的置信度，置信度越高，需要等待的静音越短：
+
+    - 语音概率趋势：静音后 VAD 概率的滑动平均下降得越低越确定
+    - 说话时长：长句通常是完整的指令，短句（比如“嗯…”）可能还没说完
+    - 尾部上下文模型（可选）：根据最近一段音频判断这句话是否说完
+
+    静音最短 min_silence、最长 max_silence 后结束，并按 session 统计实际等待的静音时长。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        min_silence: float = 200,
+        max_silence: float = 500,
+        threshold: float = 0.5,
+        long_utterance: float = 3000,
+        trend_time_constant: float = 0.1,
+        trailing_model: Optional[TrailingModel] = None,
+        trailing_context: float = 1000,
+        sample_rate: int = AudioConfig.SAMPLE_RATE,
+        max_sessions: int = 100,
+    ):
+        """
+        参数:
+            enabled: 是否开启
+            min_silence: 最短静音时长（ms）
+            max_silence: 最长静音时长（ms）
+            threshold: VAD 语音概率阈值
+            long_utterance: 超过该时长（ms）的语音视为完整的长句
+            trend_time_constant: 语音概率滑动平均的时间常数（秒）
+            trailing_model: 尾部上下文模型
+            trailing_context: 送入尾部上下文模型的音频时长（ms）
+            sample_rate: 采样率
+            max_sessions: 最多保留多少个 session 的统计数据
+        """
+        self.enabled = enabled
+        self.min_silence = min_silence
+        self.max_silence = max(max_silence, min_silence)
+        self.threshold = threshold
+        self.long_utterance = long_utterance
+        self.trend_time_constant = trend_time_constant
+        self.trailing_model = trailing_model
+        self.sample_rate = sample_rate
+        self.max_sessions = max_sessions
+
+        self.recent = RingBuffer(int(sample_rate * trailing_context / 1000))
+        self.recent_output = np.zeros(self.recent.capacity, dtype=np.int16)
+        self.sessions: OrderedDict[int, list[float]] = OrderedDict()
+        self.start()
+
+    @classmethod
+    def from_config(cls):
+        config = APP_CONFIG.get("vad", {})
+        endpoint = config.get("endpoint", {})
+        return cls(
+            enabled=endpoint.get("enabled", False),
+            min_silence=endpoint.get("min_silence", 200),
+            max_silence=config.get("min_silence_duration", 500),
+            threshold=config.get("threshold", 0.5),
+            long_utterance=endpoint.get("long_utterance", 3000),
+            trailing_model=endpoint.get("model"),
+        )
+
+    def start(self, utterance: int = 0):
+        """
+        开始一句新的话
+
+        参数:
+            utterance: 开始前已经检测到的语音（采样点数），比如 VAD 确认有人说话前的那段语音
+        """
+        self.utterance = utterance  # 已说话的采样点数（包括中间的短暂停顿）
+        self.silence = 0  # 当前连续静音的采样点数
+        self.trend = 1.0  # 语音概率的滑动平均
+        self.model_score = None  # 当前停顿的尾部上下文模型结果
+        self.recent.clear()
+
+    def _to_ms(self, num_samples: int) -> float:
+        return num_samples * 1000 / self.sample_rate
+
+    def _trailing_score(self) -> float:
+        """当前停顿只调用一次尾部上下文模型"""
+        if self.model_score is None:
+            num_samples = min(self.recent.write_pos, self.recent.capacity)
+            self.recent.copy_to(
+                self.recent.write_pos - num_samples, num_samples, self.recent_output
+            )
+            try:
+                score = self.trailing_model(self.recent_output[:num_samples])
+                self.model_score = min(max(float(score), 0), 1)
+            except Exception:
+                self.model_score = 0
+        return self.model_score
+
+    def confidence(self) -> float:
+        """这句话已经说完的置信度（0-1）"""
+        scores = [
+            1 - min(self.trend / self.threshold, 1),
+            min(self._to_ms(self.utterance) / self.long_utterance, 1),
+        ]
+        if self.trailing_model:
+            scores.append(self._trailing_score())
+        return sum(scores) / len(scores)
+
+    def required_silence(self) -> float:
+        """当前需要等待的静音时长（ms）"""
+        span = self.max_silence - self.min_silence
+        return self.max_silence - self.confidence() * span
+
+    def update(self, frames, speech_prob: float) -> bool:
+        """
+        处理一个窗口的 VAD 结果，返回是否已经说完
+        """
+        samples = np.frombuffer(frames, dtype=np.int16)
+        num_samples = len(samples)
+        self.recent.write(samples)
+
+        alpha = 1 - math.exp(
+            -num_samples / self.sample_rate / self.trend_time_constant
+        )
+        self.trend += alpha * (speech_prob - self.trend)
+
+        if speech_prob >= self.threshold:
+            self.utterance += self.silence + num_samples
+            self.silence = 0
+            self.model_score = None
+            return False
+
+        self.silence += num_samples
+        silence = self._to_ms(self.silence)
+        if silence < self.min_silence:
+            return False
+        return silence >= self.required_silence()
+
+    def record(self, session_id: int):
+        """记录本次实际等待的静音时长"""
+        delays = self.sessions.setdefault(session_id, [])
+        delays.append(self._to_ms(self.silence))
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    def stats(self, session_id: Optional[int] = None) -> dict:
+        """
+        静音等待时长统计（ms），不指定 session_id 时统计所有 session
+        """
+        if session_id is None:
+            delays = [delay for items in self.sessions.values() for delay in items]
+        else:
+            delays = self.sessions.get(session_id, [])
+        if not delays:
+            return {"count": 0}
+        return {
+            "count": len(delays),
+            "mean": sum(delays) / len(delays),
+            "min": min(delays),
+            "max": max(delays),
+            "saved": sum(self.max_silence - delay for delay in delays) / len(delays),
+        }
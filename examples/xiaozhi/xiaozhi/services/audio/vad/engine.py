@@ -0,0 +1,208 @@
+import itertools
+import threading
+
+import numpy as np
+import onnxruntime as ort
+
+from xiaozhi.utils.file import get_model_file_path
+
+
+class VADStream:
+    """
+    VADEngine 中的一路音频流
+
+    每路流有自己的循环状态和 context（保存在 engine 中），以及一块未满一个窗口的待处理音频。
+    """
+
+    def __init__(self, engine: "VADEngine", slot: int, stream_id):
+        self.engine = engine
+        self.slot = slot
+        self.stream_id = stream_id
+        self._pending = np.zeros(engine.window_size * 4, dtype=np.float32)
+        self._pending_size = 0
+        self._probs = np.zeros(16, dtype=np.float32)
+        self._probs_size = 0
+
+    @property
+    def num_windows(self):
+        return self._pending_size // self.engine.window_size
+
+    def write(self, frames):
+        """写入 int16 PCM 音频（bytes 或 numpy 数组），等待下一次 process 时统一推理"""
+        samples = (
+            frames
+            if isinstance(frames, np.ndarray)
+            else np.frombuffer(frames, dtype=np.int16)
+        )
+        # process 会在其他线程中读取并清空待处理音频
+        with self.engine.lock:
+            end = self._pending_size + len(samples)
+            if end > len(self._pending):
+                pending = np.zeros(max(end, len(self._pending) * 2), dtype=np.float32)
+                pending[: self._pending_size] = self._pending[: self._pending_size]
+                self._pending = pending
+            np.multiply(
+                samples, 1 / 32768.0, out=self._pending[self._pending_size : end]
+            )
+            self._pending_size = end
+
+    def reset(self):
+        """清空待处理音频并重置模型状态"""
+        with self.engine.lock:
+            self._pending_size = 0
+            self._probs_size = 0
+            self.engine._reset_slot(self.slot)
+
+    def _window(self, index: int) -> np.ndarray:
+        size = self.engine.window_size
+        return self._pending[index * size : (index + 1) * size]
+
+    def _append_prob(self, prob: float):
+        if self._probs_size == len(self._probs):
+            probs = np.zeros(len(self._probs) * 2, dtype=np.float32)
+            probs[: self._probs_size] = self._probs
+            self._probs = probs
+        self._probs[self._probs_size] = prob
+        self._probs_size += 1
+
+    def _consume(self, num_windows: int) -> np.ndarray:
+        """丢弃已推理的窗口，返回这次推理得到的概率"""
+        consumed = num_windows * self.engine.window_size
+        remain = self._pending_size - consumed
+        self._pending[:remain] = self._pending[consumed : self._pending_size]
+        self._pending_size = remain
+        probs = self._probs[: self._probs_size].copy()
+        self._probs_size = 0
+        return probs
+
+
+class VADEngine:
+    """
+    多路 Silero VAD 推理引擎
+
+    所有音频流共用同一个 InferenceSession，每路流的循环状态和 context 单独保存。
+    每一步把所有流中已经凑满一个窗口的音频合并成一个 batch_size=N 的输入，只调用一次模型。
+
+    用法：
+        engine = VADEngine()
+        stream = engine.register("speaker-1")
+        stream.write(frames)
+        probs = engine.process()[stream.stream_id]
+    """
+
+    def __init__(self, path: str = None, sample_rate: int = 16000, capacity=4):
+        opts = ort.SessionOptions()
+        opts.inter_op_num_threads = 1
+        opts.intra_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            path or get_model_file_path("silero_vad.onnx"),
+            providers=["CPUExecutionProvider"],
+            sess_options=opts,
+        )
+        self.sample_rate = sample_rate
+        self.window_size = 512 if sample_rate == 16000 else 256
+        self.context_size = 64 if sample_rate == 16000 else 32
+        self.lock = threading.Lock()
+        self.streams: dict[object, VADStream] = {}
+        self._ids = itertools.count()
+        self._sr = np.array(sample_rate, dtype="int64")
+        self._free_slots = []
+        self._capacity = 0
+        self._states = np.zeros((2, 0, 128), dtype=np.float32)
+        self._contexts = np.zeros((0, self.context_size), dtype=np.float32)
+        self._batches = {}
+        self._grow(capacity)
+
+    def _grow(self, capacity: int):
+        """扩容每路流的状态数组"""
+        states = np.zeros((2, capacity, 128), dtype=np.float32)
+        contexts = np.zeros((capacity, self.context_size), dtype=np.float32)
+        states[:, : self._capacity] = self._states
+        contexts[: self._capacity] = self._contexts
+        self._free_slots.extend(range(self._capacity, capacity))
+        self._states = states
+        self._contexts = contexts
+        self._capacity = capacity
+
+    def _reset_slot(self, slot: int):
+        self._states[:, slot] = 0
+        self._contexts[slot] = 0
+
+    def _batch_buffers(self, batch_size: int):
+        """按 batch 大小缓存模型输入数组，避免每一步重新分配"""
+        buffers = self._batches.get(batch_size)
+        if buffers is None:
+            buffers = (
+                np.zeros(
+                    (batch_size, self.context_size + self.window_size),
+                    dtype=np.float32,
+                ),
+                np.zeros((2, batch_size, 128), dtype=np.float32),
+            )
+            self._batches[batch_size] = buffers
+        return buffers
+
+    def register(self, stream_id=None) -> VADStream:
+        """注册一路音频流（同一个 stream_id 重复注册时返回已有的流）"""
+        with self.lock:
+            if stream_id is None:
+                # 自动分配的 id 只增不减，注销后也不会和已有的流重复
+                stream_id = next(self._ids)
+                while stream_id in self.streams:
+                    stream_id = next(self._ids)
+            elif stream_id in self.streams:
+                return self.streams[stream_id]
+            if not self._free_slots:
+                self._grow(self._capacity * 2)
+            slot = self._free_slots.pop(0)
+            self._reset_slot(slot)
+            stream = VADStream(self, slot, stream_id)
+            self.streams[stream_id] = stream
+            return stream
+
+    def unregister(self, stream: VADStream):
+        with self.lock:
+            if self.streams.get(stream.stream_id) is stream:
+                del self.streams[stream.stream_id]
+                self._free_slots.append(stream.slot)
+
+    def _step(self, streams: list[VADStream], index: int):
+        """对每路流的第 index 个窗口做一次批量推理"""
+        batch_size = len(streams)
+        inputs, states = self._batch_buffers(batch_size)
+        context_size = self.context_size
+        slots = [stream.slot for stream in streams]
+        for i, stream in enumerate(streams):
+            inputs[i, :context_size] = self._contexts[stream.slot]
+            inputs[i, context_size:] = stream._window(index)
+        np.take(self._states, slots, axis=1, out=states)
+
+        out, state = self.session.run(
+            None, {"input": inputs, "state": states, "sr": self._sr}
+        )
+
+        self._states[:, slots] = state
+        self._contexts[slots] = inputs[:, -context_size:]
+        for i, stream in enumerate(streams):
+            stream._append_prob(out[i, 0])
+
+    def process(self) -> dict[object, np.ndarray]:
+        """
+        推理所有流中已写入的完整窗口
+
+        返回每路流（stream_id）本次得到的语音概率，没有完整窗口的流返回空数组。
+        """
+        with self.lock:
+            streams = list(self.streams.values())
+            num_windows = [stream.num_windows for stream in streams]
+            for index in range(max(num_windows, default=0)):
+                batch = [
+                    stream
+                    for stream, count in zip(streams, num_windows)
+                    if count > index
+                ]
+                self._step(batch, index)
+            return {
+                stream.stream_id: stream._consume(count)
+                for stream, count in zip(streams, num_windows)
+            }
@@ -14,6 +14,7 @@ class OnnxWrapper:
         )
         self.reset_states()
         self.sample_rates = [8000, 16000]
+        self.reset_stream()
 
     def _validate_input(self, x, sr: int):
         if len(x.shape) == 1:
@@ -83,6 +84,142 @@ class OnnxWrapper:
         self._last_batch_size = batch_size
         return out
 
+    def reset_stream(self, sr: int = 16000):
+        """重置流式推理的状态，并预分配推理用到的所有数组"""
+        self._stream_sr = sr
+        self._window_size = 512 if sr == 16000 else 256
+        self._context_size = 64 if sr == 16000 else 32
+        # 输入 = [上一个窗口末尾的 context, 当前窗口]
+        self._stream_input = np.zeros(
+            (1, self._context_size + self._window_size), dtype=np.float32
+        )
+        # 两份循环状态交替作为输入/输出，避免每一帧拷贝状态
+        self._stream_states = np.zeros((2, 2, 1, 128), dtype=np.float32)
+        self._state_index = 0
+        self._stream_output = np.zeros((1, 1), dtype=np.float32)
+        self._stream_sr_tensor = np.array(sr, dtype="int64")
+        self._bindings = self._create_io_bindings()
+        # 不足一个窗口的剩余采样点
+        self._pending = np.zeros(self._window_size, dtype=np.float32)
+        self._pending_size = 0
+        self._samples = np.zeros(0, dtype=np.float32)
+        self._probs = np.zeros(0, dtype=np.float32)
+
+    def clear_stream(self):
+        """清空循环状态、context 和剩余采样点，预分配的数组和 binding 保留"""
+        self._stream_input.fill(0)
+        self._stream_states.fill(0)
+        self._pending_size = 0
+
+    def _create_io_bindings(self):
+        """
+        为两份循环状态各创建一个 IO binding，输入输出全部绑定到预分配的数组上
+
+        不支持 IO binding 时返回 None，退回到 session.run
+        """
+        try:
+            output_names = [output.name for output in self.session.get_outputs()]
+            bindings = []
+            for idx in range(2):
+                state_in = self._stream_states[idx]
+                state_out = self._stream_states[1 - idx]
+                binding = self.session.io_binding()
+                binding.bind_cpu_input("input", self._stream_input)
+                binding.bind_cpu_input("state", state_in)
+                binding.bind_cpu_input("sr", self._stream_sr_tensor)
+                for name, array in zip(
+                    output_names, [self._stream_output, state_out]
+                ):
+                    binding.bind_output(
+                        name,
+                        device_type="cpu",
+                        device_id=0,
+                        element_type=np.float32,
+                        shape=array.shape,
+                        buffer_ptr=array.ctypes.data,
+                    )
+                bindings.append(binding)
+            return bindings
+        except Exception:
+            return None
+
+    def _run_window(self, window: np.ndarray) -> float:
+        context_size = self._context_size
+        self._stream_input[0, :context_size] = self._stream_input[0, -context_size:]
+        self._stream_input[0, context_size:] = window
+
+        idx = self._state_index
+        if self._bindings:
+            self.session.run_with_iobinding(self._bindings[idx])
+        else:
+            out, state = self.session.run(
+                None,
+                {
+                    "input": self._stream_input,
+                    "state": self._stream_states[idx],
+                    "sr": self._stream_sr_tensor,
+                },
+            )
+            self._stream_output[...] = out
+            self._stream_states[1 - idx] = state
+        self._state_index = 1 - idx
+        return self._stream_output[0, 0]
+
+    def stream(self, samples: np.ndarray, sr: int = 16000) -> np.ndarray:
+        """
+        流式推理任意长度的 int16 音频
+
+        音频会被切分成 512（8k 采样率时为 256）个采样点的窗口，依次送入模型，
+        不足一个窗口的部分留到下一次调用。
+
+        返回每个完整窗口的语音概率，数组在下一次调用之前有效。
+        """
+        if sr != self._stream_sr:
+            self.reset_stream(sr)
+
+        num_samples = len(samples)
+        if len(self._samples) < num_samples:
+            self._samples = np.zeros(num_samples, dtype=np.float32)
+        x = self._samples[:num_samples]
+        np.multiply(samples, 1 / 32768.0, out=x, dtype=np.float32)
+        return self.stream_float(x, sr)
+
+    def stream_float(self, x: np.ndarray, sr: int = 16000) -> np.ndarray:
+        """
+        流式推理已经转换为 float32（[-1, 1)）的音频，用法同 stream
+        """
+        if sr != self._stream_sr:
+            self.reset_stream(sr)
+
+        num_samples = len(x)
+        window_size = self._window_size
+        max_windows = (self._pending_size + num_samples) // window_size
+        if len(self._probs) < max_windows:
+            self._probs = np.zeros(max_windows, dtype=np.float32)
+
+        count = 0
+        pos = 0
+        if self._pending_size:
+            pos = min(window_size - self._pending_size, num_samples)
+            self._pending[self._pending_size : self._pending_size + pos] = x[:pos]
+            self._pending_size += pos
+            if self._pending_size == window_size:
+                self._probs[count] = self._run_window(self._pending)
+                count += 1
+                self._pending_size = 0
+
+        while pos + window_size <= num_samples:
+            self._probs[count] = self._run_window(x[pos : pos + window_size])
+            count += 1
+            pos += window_size
+
+        remain = num_samples - pos
+        if remain:
+            self._pending[:remain] = x[pos:]
+            self._pending_size = remain
+
+        return self._probs[:count]
+
 
 class _Silero:
     def __init__(self) -> None:
@@ -91,12 +228,36 @@ class _Silero:
         )
 
     def vad(self, frames, sample_rate):
+        """检测单个 32ms（512 个采样点）窗口的语音概率"""
         try:
             audio_int16 = np.frombuffer(frames, dtype=np.int16)
-            audio_float32 = audio_int16.astype(np.float32) / 32768.0
-            return self.model(audio_float32, sample_rate).item()
+            speech_probs = self.model.stream(audio_int16, sample_rate)
+            return speech_probs[-1].item() if len(speech_probs) else None
         except Exception:
             return None
 
+    def vad_stream(self, frames, sample_rate=16000):
+        """
+        批量检测任意长度的音频，返回每 32ms（512 个采样点）窗口的语音概率
+
+        返回的数组在下一次调用之前有效。
+        """
+        try:
+            audio_int16 = np.frombuffer(frames, dtype=np.int16)
+            return self.model.stream(audio_int16, sample_rate)
+        except Exception:
+            return np.zeros(0, dtype=np.float32)
+
+    def vad_samples(self, samples: np.ndarray, sample_rate=16000):
+        """同 vad_stream，输入为已经转换好的 float32 音频"""
+        try:
+            return self.model.stream_float(samples, sample_rate)
+        except Exception:
+            return np.zeros(0, dtype=np.float32)
+
+    def reset(self):
+        """中间有音频没有送入模型时调用，下一块从干净的状态开始检测"""
+        self.model.clear_stream()
+
 
 Silero = _Silero()
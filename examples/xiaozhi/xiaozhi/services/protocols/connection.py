@@ -0,0 +1,255 @@
+import asyncio
+import random
+import socket
+import time
+from typing import Callable, Optional
+
+import websockets
+from websockets.uri import parse_uri
+
+try:
+    from websockets.uri import get_proxy
+except ImportError:
+    # 新版本的 websockets 移到了 websockets.proxy
+    from websockets.proxy import get_proxy
+
+from config import APP_CONFIG
+
+
+class Backoff:
+    """
+    带随机抖动的指数退避（full jitter）
+
+    第 n 次重试前等待 [0, min(max_delay, base * 2^n)] 之间的随机时长，
+    避免大量设备在服务端重启后同时重连。
+    """
+
+    def __init__(self, base: float = 0.5, max_delay: float = 30):
+        self.base = base
+        self.max_delay = max_delay
+        self.attempts = 0
+
+    def reset(self):
+        self.attempts = 0
+
+    def next(self) -> float:
+        """下一次重试前的等待时长（秒）"""
+        delay = min(self.max_delay, self.base * 2**self.attempts)
+        self.attempts += 1
+        return random.uniform(0, delay)
+
+
+class DNSCache:
+    """缓存域名解析结果，重连时不再等待 DNS 查询"""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self.entries: dict[tuple[str, int], tuple[float, list]] = {}
+
+    async def resolve(self, host: str, port: int) -> list:
+        key = (host, port)
+        entry = self.entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, port, type=socket.SOCK_STREAM
+        )
+        self.entries[key] = (time.monotonic() + self.ttl, infos)
+        return infos
+
+    def invalidate(self, host: str, port: int):
+        self.entries.pop((host, port), None)
+
+
+def enable_keepalive(sock: socket.socket, idle: int, interval: int, count: int):
+    """开启 TCP keepalive，及时发现已经断开的连接"""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    options = [
+        ("TCP_KEEPIDLE", idle),
+        ("TCP_KEEPALIVE", idle),  # macOS
+        ("TCP_KEEPINTVL", interval),
+        ("TCP_KEEPCNT", count),
+    ]
+    for name, value in options:
+        if hasattr(socket, name):
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+            except OSError:
+                pass
+
+
+class ConnectionManager:
+    """
+    WebSocket 连接管理
+
+    - 建立连接：使用缓存的 DNS 结果，开启 TCP keepalive（TLS 跑在同一个 socket 上）
+    - 重连：失败后按带抖动的指数退避重试
+    - 预热：可以保持一个已经完成 TCP/TLS/WebSocket 握手的备用连接，
+      唤醒时直接取用，不用等待冷启动的握手
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Callable[[], dict],
+        backoff_base: float = 0.5,
+        backoff_max: float = 30,
+        open_timeout: float = 10,
+        keepalive: int = 30,
+        dns_ttl: float = 300,
+        prewarm: bool = False,
+        prewarm_interval: float = 5,
+    ):
+        """
+        参数:
+            url: WebSocket 服务地址
+            headers: 返回握手请求头的函数
+            backoff_base: 第一次重试的最长等待时长（秒）
+            backoff_max: 重试等待时长的上限（秒）
+            open_timeout: 建立连接的超时时间（秒）
+            keepalive: TCP keepalive 的空闲时长（秒），0 表示不开启
+            dns_ttl: DNS 缓存时长（秒）
+            prewarm: 是否保持一个预热的备用连接
+            prewarm_interval: 备用连接被关闭后，至少等待多久（秒）再重新预热
+        """
+        self.url = url
+        self.headers = headers
+        self.backoff = Backoff(backoff_base, backoff_max)
+        self.open_timeout = open_timeout
+        self.keepalive = keepalive
+        self.dns = DNSCache(dns_ttl)
+        self.prewarm = prewarm
+        self.prewarm_interval = prewarm_interval
+        self.standby = None
+        self._standby_task: Optional[asyncio.Task] = None
+        self.metrics = {
+            "dials": 0,  # 新建连接的次数
+            "failures": 0,  # 连接失败的次数
+            "standby_hits": 0,  # 直接使用预热连接的次数
+            "dial_time": 0.0,  # 最近一次建立连接的耗时（ms）
+        }
+
+    @classmethod
+    def from_config(cls, url, headers):
+        config = APP_CONFIG.get("connection", {})
+        return cls(
+            url,
+            headers,
+            backoff_base=config.get("backoff_base", 0.5),
+            backoff_max=config.get("backoff_max", 30),
+            open_timeout=config.get("open_timeout", 10),
+            keepalive=config.get("keepalive", 30),
+            dns_ttl=config.get("dns_ttl", 300),
+            prewarm=config.get("prewarm", False),
+            prewarm_interval=config.get("prewarm_interval", 5),
+        )
+
+    def stats(self) -> dict:
+        return {**self.metrics, "standby": self.standby is not None}
+
+    async def _open_socket(self, host: str, port: int) -> socket.socket:
+        """按缓存的 DNS 结果依次尝试连接"""
+        loop = asyncio.get_running_loop()
+        error = None
+        infos = await self.dns.resolve(host, port)
+        for family, type_, proto, _, address in infos:
+            sock = socket.socket(family, type_, proto)
+            sock.setblocking(False)
+            try:
+                await loop.sock_connect(sock, address)
+            except OSError as e:
+                sock.close()
+                error = e
+                continue
+            except BaseException:
+                sock.close()
+                raise
+            if self.keepalive:
+                interval = max(self.keepalive // 3, 1)
+                enable_keepalive(sock, self.keepalive, interval, 3)
+            return sock
+        # 缓存的地址都连不上时，下次重新解析
+        self.dns.invalidate(host, port)
+        raise error or OSError(f"无法解析 {host}")
+
+    async def dial(self):
+        """新建一个 WebSocket 连接"""
+        self.metrics["dials"] += 1
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(self.open_timeout):
+                kwargs = {}
+                uri = parse_uri(self.url)
+                if get_proxy(uri) is None:
+                    # 配置了代理时交给 websockets 处理，不能自己建立 socket
+                    kwargs["sock"] = await self._open_socket(uri.host, uri.port)
+                websocket = await websockets.connect(
+                    uri=self.url,
+                    additional_headers=self.headers(),
+                    open_timeout=None,
+                    **kwargs,
+                )
+        except Exception:
+            self.metrics["failures"] += 1
+            raise
+        self.metrics["dial_time"] = (time.monotonic() - start) * 1000
+        return websocket
+
+    async def acquire(self):
+        """获取一个可用的连接：优先使用预热连接，否则新建"""
+        websocket, self.standby = self.standby, None
+        if websocket is not None:
+            # 备用连接已被取走，不再由预热任务监视
+            self._standby_task.cancel()
+            self._standby_task = None
+        if websocket is not None and websocket.state == websockets.State.OPEN:
+            self.metrics["standby_hits"] += 1
+        else:
+            if websocket is not None:
+                await self._close(websocket)
+            websocket = await self.dial()
+        self.warm_up()
+        return websocket
+
+    def warm_up(self):
+        """在后台准备一个备用连接"""
+        if not self.prewarm or self.standby is not None:
+            return
+        if self._standby_task and not self._standby_task.done():
+            return
+        loop = asyncio.get_running_loop()
+        self._standby_task = loop.create_task(self._warm_up())
+
+    async def _warm_up(self):
+        backoff = Backoff(self.backoff.base, self.backoff.max_delay)
+        while self.prewarm:
+            try:
+                websocket = await self.dial()
+            except Exception:
+                await asyncio.sleep(backoff.next())
+                continue
+            self.standby = websocket
+            opened_at = time.monotonic()
+            # 备用连接被服务端关闭时重新预热
+            await websocket.wait_closed()
+            self.standby = None
+            # 备用连接不发 hello，服务端可能很快就把它关掉：
+            # 只有保持得足够久才重置退避，并且两次预热之间至少间隔 prewarm_interval
+            if time.monotonic() - opened_at >= backoff.max_delay:
+                backoff.reset()
+            await asyncio.sleep(max(self.prewarm_interval, backoff.next()))
+
+    async def _close(self, websocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        """关闭备用连接"""
+        if self._standby_task:
+            self._standby_task.cancel()
+            self._standby_task = None
+        if self.standby is not None:
+            await self._close(self.standby)
+            self.standby = None
@@ -1,6 +1,7 @@
 import json
 
 from xiaozhi.services.protocols.typing import ListeningMode
+from xiaozhi.utils.trace import Tracer
 
 
 class Protocol:
@@ -55,11 +56,13 @@ class Protocol:
             "mode": mode_map[mode],
         }
         await self.send_text(json.dumps(message))
+        Tracer.mark("start_listening")
 
     async def send_stop_listening(self):
         """发送停止监听的消息"""
         message = {"session_id": self.session_id, "type": "listen", "state": "stop"}
         await self.send_text(json.dumps(message))
+        Tracer.mark("stop_listening")
 
     async def send_iot_descriptors(self, descriptors):
         """发送物联网设备描述信息"""
@@ -1,9 +1,13 @@
 import asyncio
 import json
+import threading
+import time
+from collections import deque
 
-import websockets
-
+from config import APP_CONFIG
 from xiaozhi.ref import get_xiaozhi
+from xiaozhi.services.audio.opus import get_encoder_profile
+from xiaozhi.services.protocols.connection import ConnectionManager
 from xiaozhi.services.protocols.protocol import Protocol
 from xiaozhi.services.protocols.typing import DeviceState
 from xiaozhi.utils.config import ConfigManager
@@ -21,15 +25,43 @@ class WebsocketProtocol(Protocol):
             self.server_sample_rate * (self.server_frame_duration / 1000)
         )
         self.connected = False
+        self.closing = False  # 主动关闭了音频通道，心跳不再自动重连
         self.hello_received = None  # 初始化时先设为 None
+        self.loop = None
+
+        # 上行音频发送队列：任意线程写入，唯一的发送协程按顺序发出
+        uplink = APP_CONFIG.get("uplink", {})
+        frame_duration = get_encoder_profile()["frame_duration"]
+        max_buffer = uplink.get("max_buffer", 1000)
+        self.max_send_frames = max(1, int(max_buffer / frame_duration))
+        self.send_lock = threading.Lock()
+        self.send_queue: deque[tuple[float, bytes]] = deque()
+        self._send_waiting = False
+        self._send_wakeup = None
+        self.sender_task = None
+        self._failed_websocket = None  # 已经打印过发送失败日志的连接
+        self.send_metrics = {
+            "sent": 0,  # 已发送的帧
+            "dropped": 0,  # 链路阻塞时丢弃的帧
+            "dropped_disconnected": 0,  # 连接断开时丢弃的帧
+            "send_errors": 0,  # 发送失败的帧
+            "max_depth": 0,  # 队列的最大深度（帧）
+            "latency": 0.0,  # 最近一帧从入队到发送完成的耗时（ms）
+            "max_latency": 0.0,  # 最大发送延迟（ms）
+        }
         self.WEBSOCKET_URL = self.config.get_config("NETWORK.WEBSOCKET_URL")
         self.WEBSOCKET_ACCESS_TOKEN = self.config.get_config(
             "NETWORK.WEBSOCKET_ACCESS_TOKEN"
         )
         self.CLIENT_ID = self.config.get_client_id()
         self.DEVICE_ID = self.config.get_device_id()
+        self.connection = ConnectionManager.from_config(
+            self.WEBSOCKET_URL, self._headers
+        )
+        self.connect_lock = asyncio.Lock()
 
     async def _close_websocket(self):
+        self.clear_audio()
         if self.websocket:
             try:
                 await self.websocket.close()
@@ -38,26 +70,43 @@ class WebsocketProtocol(Protocol):
             except Exception:
                 pass
 
+    def _headers(self) -> dict:
+        """握手请求头"""
+        return {
+            "Authorization": f"Bearer {self.WEBSOCKET_ACCESS_TOKEN}",
+            "Protocol-Version": "1",
+            "Device-Id": self.DEVICE_ID,  # 获取设备MAC地址
+            "Client-Id": self.CLIENT_ID,
+        }
+
     async def connect(self) -> bool:
         """连接到WebSocket服务器"""
+        async with self.connect_lock:
+            return await self._connect()
+
+    async def ensure_connected(self, notify: bool = True) -> bool:
+        """
+        连接已断开时立即重连（优先使用预热的备用连接）
+
+        参数:
+            notify: 连接失败时是否调用 on_network_error（心跳的后台重连不调用）
+        """
+        async with self.connect_lock:
+            if self.is_audio_channel_opened():
+                return True
+            return await self._connect(notify)
+
+    async def _connect(self, notify: bool = True) -> bool:
+        self.closing = False
         try:
             await self._close_websocket()
 
             # 在连接时创建 Event，确保在正确的事件循环中
             self.hello_received = asyncio.Event()
 
-            # 配置连接
-            headers = {
-                "Authorization": f"Bearer {self.WEBSOCKET_ACCESS_TOKEN}",
-                "Protocol-Version": "1",
-                "Device-Id": self.DEVICE_ID,  # 获取设备MAC地址
-                "Client-Id": self.CLIENT_ID,
-            }
-
-            # 建立WebSocket连接
-            self.websocket = await websockets.connect(
-                uri=self.WEBSOCKET_URL, additional_headers=headers
-            )
+            # 建立WebSocket连接（DNS 缓存、TCP keepalive、预热连接见 ConnectionManager）
+            self.websocket = await self.connection.acquire()
+            self._start_sender()
 
             # 启动消息处理循环
             asyncio.create_task(self._message_handler())
@@ -71,7 +120,7 @@ class WebsocketProtocol(Protocol):
                     "format": "opus",
                     "sample_rate": 16000,
                     "channels": 1,
-                    "frame_duration": 60,
+                    "frame_duration": get_encoder_profile()["frame_duration"],
                 },
             }
             await self.send_text(json.dumps(hello_message))
@@ -80,13 +129,14 @@ class WebsocketProtocol(Protocol):
             try:
                 await asyncio.wait_for(self.hello_received.wait(), timeout=10.0)
                 self.connected = True
+                self.connection.backoff.reset()
                 return True
             except asyncio.TimeoutError:
-                if self.on_network_error:
+                if notify and self.on_network_error:
                     self.on_network_error("等待响应超时")
                 return False
         except Exception as e:
-            if self.on_network_error:
+            if notify and self.on_network_error:
                 self.on_network_error(f"无法连接服务: {str(e)}")
             return False
 
@@ -112,16 +162,82 @@ class WebsocketProtocol(Protocol):
             if self.on_audio_channel_closed:
                 await self.on_audio_channel_closed()
 
-    async def send_audio(self, frames: list[bytes]):
-        """发送音频数据"""
-        if not self.is_audio_channel_opened():  # 使用已有的 is_connected 方法
+    def _start_sender(self):
+        """在当前事件循环上启动音频发送协程"""
+        if self.sender_task and not self.sender_task.done():
             return
+        self.loop = asyncio.get_running_loop()
+        self._send_wakeup = asyncio.Event()
+        self.sender_task = self.loop.create_task(self._audio_sender())
 
-        try:
+    def queue_audio(self, frames: list[bytes]):
+        """
+        把音频帧放入发送队列（线程安全）
+
+        链路阻塞、队列超过 max_buffer 时丢弃最早的帧，发送端不会无限堆积。
+        """
+        if not frames or not self.is_audio_channel_opened():
+            return
+        now = time.monotonic()
+        with self.send_lock:
             for frame in frames:
-                await self.websocket.send(frame)
-        except Exception:
-            pass
+                self.send_queue.append((now, frame))
+            while len(self.send_queue) > self.max_send_frames:
+                self.send_queue.popleft()
+                self.send_metrics["dropped"] += 1
+            self.send_metrics["max_depth"] = max(
+                self.send_metrics["max_depth"], len(self.send_queue)
+            )
+            if not self._send_waiting:
+                return
+            self._send_waiting = False
+        self.loop.call_soon_threadsafe(self._send_wakeup.set)
+
+    def clear_audio(self):
+        """丢弃还没发送的音频"""
+        with self.send_lock:
+            self.send_queue.clear()
+
+    def send_stats(self) -> dict:
+        """发送队列的统计数据"""
+        return {**self.send_metrics, "depth": len(self.send_queue)}
+
+    async def _next_audio(self) -> tuple[float, bytes]:
+        while True:
+            with self.send_lock:
+                if self.send_queue:
+                    return self.send_queue.popleft()
+                self._send_waiting = True
+                self._send_wakeup.clear()
+            await self._send_wakeup.wait()
+
+    async def _audio_sender(self):
+        """按顺序发送队列中的音频帧"""
+        while True:
+            queued_at, frame = await self._next_audio()
+            websocket = self.websocket
+            if websocket is None or not self.connected:
+                self.send_metrics["dropped_disconnected"] += 1
+                continue
+            try:
+                await websocket.send(frame)
+            except Exception as e:
+                self.send_metrics["send_errors"] += 1
+                # 每个连接只打印第一次失败，避免断线时每帧刷屏
+                if websocket is not self._failed_websocket:
+                    self._failed_websocket = websocket
+                    print(f"⚠️ 音频发送失败: {e}")
+                continue
+            latency = (time.monotonic() - queued_at) * 1000
+            self.send_metrics["sent"] += 1
+            self.send_metrics["latency"] = latency
+            self.send_metrics["max_latency"] = max(
+                self.send_metrics["max_latency"], latency
+            )
+
+    async def send_audio(self, frames: list[bytes]):
+        """发送音频数据（放入发送队列后立即返回）"""
+        self.queue_audio(frames)
 
     async def send_text(self, message: str):
         """发送文本消息"""
@@ -156,22 +272,21 @@ class WebsocketProtocol(Protocol):
             if not transport or transport != "websocket":
                 return
 
-            # TODO 使用默认的 24k 采样率
-            # xiaozhi-esp32-server 返回的参数是 16k 采样率，但实际用的是 24k 采样率
-
-            # 获取音频参数
-            # audio_params = data.get("audio_params")
-            # if audio_params:
-            #     # 获取服务器的采样率
-            #     sample_rate = audio_params.get("sample_rate")
-            #     if sample_rate:
-            #         self.server_sample_rate = sample_rate
-            #     frame_duration = audio_params.get("frame_duration")
-            #     if frame_duration:
-            #         self.server_frame_duration = frame_duration
-            #     self.server_frame_size = int(
-            #         self.server_sample_rate * (self.server_frame_duration / 1000)
-            #     )
+            # 使用服务端协商的下行音频参数（Opus 解码器可以输出任意支持的采样率，
+            # 即使服务端实际编码的采样率与声明的不一致，也只影响音质，不会解码错误）
+            audio_params = data.get("audio_params")
+            if audio_params and APP_CONFIG.get("output", {}).get(
+                "use_server_audio_params", True
+            ):
+                sample_rate = audio_params.get("sample_rate")
+                if sample_rate:
+                    self.server_sample_rate = sample_rate
+                frame_duration = audio_params.get("frame_duration")
+                if frame_duration:
+                    self.server_frame_duration = frame_duration
+                self.server_frame_size = int(
+                    self.server_sample_rate * (self.server_frame_duration / 1000)
+                )
 
             # 设置 hello 接收事件
             self.hello_received.set()
@@ -185,7 +300,11 @@ class WebsocketProtocol(Protocol):
                 self.on_network_error(f"处理服务器响应失败: {str(e)}")
 
     async def close_audio_channel(self):
-        """关闭音频通道"""
+        """关闭音频通道（下次开始对话时再重新连接）"""
+        self.closing = True
+        self.clear_audio()
+        # 同时关闭备用连接，停止预热
+        await self.connection.close()
         if self.websocket:
             try:
                 await self.websocket.close()
@@ -198,12 +317,20 @@ class WebsocketProtocol(Protocol):
 
     async def heartbeat(self):
         while True:
-            if self.websocket and get_xiaozhi().device_state == DeviceState.IDLE:
+            # 主动关闭音频通道后（网络错误、退出）不再自动重连，等下次开始对话时再连接
+            if get_xiaozhi().device_state == DeviceState.IDLE and not self.closing:
+                if not self.is_audio_channel_opened():
+                    # 连接已断开，按带抖动的指数退避重连
+                    await asyncio.sleep(self.connection.backoff.next())
+                    if not self.closing:
+                        await self.ensure_connected(notify=False)
+                    continue
                 try:
                     await self.send_text(
                         json.dumps({"session_id": "", "type": "ping"})
                     )
                 except Exception:
                     # 发送心跳失败，重新连接
-                    await self.open_audio_channel()
+                    self.connected = False
+                    continue
             await asyncio.sleep(1)
@@ -0,0 +1,161 @@
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from config import APP_CONFIG
+from xiaozhi.utils.base import json_encode
+
+
+class SessionTrace:
+    """一次对话中各个步骤的时间点（相对于唤醒时刻，monotonic 时钟）"""
+
+    def __init__(self, session_id: int, source: str, origin: float):
+        self.session_id = session_id
+        self.source = source
+        self.origin = origin
+        self.started_at = time.time() - (time.monotonic() - origin)
+        self.marks: dict[str, float] = {}
+
+    def mark(self, step: str, timestamp: float):
+        # 同一个步骤只记录第一次（比如第一条 stt 消息、第一帧音频）
+        self.marks.setdefault(step, (timestamp - self.origin) * 1000)
+
+    def to_dict(self) -> dict:
+        steps = sorted(self.marks.items(), key=lambda item: item[1])
+        spans = []
+        previous, previous_at = "wake", 0.0
+        for step, at in steps:
+            duration = round(at - previous_at, 1)
+            spans.append({"from": previous, "to": step, "ms": duration})
+            previous, previous_at = step, at
+        return {
+            "session_id": self.session_id,
+            "source": self.source,
+            "started_at": round(self.started_at, 3),
+            "marks": {step: round(at, 1) for step, at in steps},
+            "spans": spans,
+        }
+
+
+class _Tracer:
+    """
+    对话延迟追踪
+
+    唤醒（KWS / 小爱）时记下时间，EventManager 开始新的 session 后，各个环节
+    （开始 session、开始/停止监听、说话结束、第一条 stt / tts 消息、第一帧音频……）
+    调用 mark 记录相对于唤醒时刻的耗时。session 结束时输出一行 JSON，
+    并累计到内存中的直方图，用来衡量唤醒到响应的延迟。
+
+    JSON 由后台线程写入文件，不阻塞事件循环和音频线程。
+    """
+
+    def __init__(self):
+        config = APP_CONFIG.get("trace", {})
+        self.enabled = config.get("enabled", False)
+        self.path: Optional[str] = config.get("path")
+        self.max_samples = config.get("max_samples", 1000)
+        self.max_sessions = config.get("max_sessions", 10)
+
+        self.lock = threading.Lock()
+        self.pending_wake = None  # (时间, 来源)：唤醒后、session 开始前
+        self.current: Optional[SessionTrace] = None
+        self.sessions: OrderedDict[int, SessionTrace] = OrderedDict()
+        self.samples: dict[str, deque[float]] = {}
+        self.records: queue.SimpleQueue[dict] = queue.SimpleQueue()
+        self.writer = None
+
+    def wake(self, source: str):
+        """记录唤醒时刻（session 还没开始）"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.pending_wake = (time.monotonic(), source)
+
+    def start(self, session_id: int, source: str):
+        """开始新的 session，上一个 session 随之结束"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self.lock:
+            previous = self.current
+            origin = now
+            if self.pending_wake and now - self.pending_wake[0] < 30:
+                origin, source = self.pending_wake
+            self.pending_wake = None
+            self.current = SessionTrace(session_id, source, origin)
+            self.sessions[session_id] = self.current
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        if previous:
+            self._emit(previous)
+
+    def mark(self, step: str, session_id: Optional[int] = None):
+        """记录当前（或指定）session 的一个步骤"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self.lock:
+            trace = self.current
+            if session_id is not None:
+                trace = self.sessions.get(session_id)
+            if trace:
+                trace.mark(step, now)
+
+    def finish(self):
+        """当前 session 已经结束（比如 TTS 播放完毕）"""
+        if not self.enabled:
+            return
+        with self.lock:
+            trace, self.current = self.current, None
+        if trace:
+            self._emit(trace)
+
+    def _emit(self, trace: SessionTrace):
+        record = trace.to_dict()
+        with self.lock:
+            for step, at in record["marks"].items():
+                if step not in self.samples:
+                    self.samples[step] = deque(maxlen=self.max_samples)
+                self.samples[step].append(at)
+            if not self.path:
+                return
+            if not self.writer:
+                self.writer = threading.Thread(target=self._write_loop, daemon=True)
+                self.writer.start()
+        self.records.put(record)
+
+    def _write_loop(self):
+        """后台线程：把 session 记录追加到文件，积压的记录一次写入"""
+        while True:
+            records = [self.records.get()]
+            while not self.records.empty():
+                records.append(self.records.get())
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json_encode(record) + "\n" for record in records)
+            except Exception:
+                pass
+
+    def histogram(self) -> dict:
+        """各个步骤相对于唤醒时刻的耗时分布（ms）"""
+        with self.lock:
+            samples = {step: sorted(values) for step, values in self.samples.items()}
+
+        def percentile(values, p):
+            return values[min(int(len(values) * p), len(values) - 1)]
+
+        return {
+            step: {
+                "count": len(values),
+                "p50": percentile(values, 0.5),
+                "p90": percentile(values, 0.9),
+                "p99": percentile(values, 0.99),
+                "max": values[-1],
+            }
+            for step, values in samples.items()
+        }
+
+
+Tracer = _Tracer()
@@ -2,14 +2,15 @@ import argparse
 import asyncio
 import threading
 
-import numpy as np
 import open_xiaoai_server
 
 from xiaozhi.event import EventManager
 from xiaozhi.ref import get_speaker, set_xiaoai
+from xiaozhi.services.audio.output import OutputScheduler
 from xiaozhi.services.audio.stream import GlobalStream
 from xiaozhi.services.speaker import SpeakerManager
 from xiaozhi.utils.base import json_decode
+from xiaozhi.utils.trace import Tracer
 
 ASCII_BANNER = """
 ▄▖      ▖▖▘    ▄▖▄▖
@@ -25,6 +26,7 @@ class XiaoAI:
     mode = "xiaoai"
     speaker = SpeakerManager()
     async_loop: asyncio.AbstractEventLoop = None
+    output_scheduler: OutputScheduler = None
 
     @classmethod
     def setup_mode(cls):
@@ -45,18 +47,21 @@ class XiaoAI:
 
     @classmethod
     def on_input_data(cls, data: bytes):
-        audio_array = np.frombuffer(data, dtype=np.uint16)
-        GlobalStream.input(audio_array.tobytes())
+        GlobalStream.input(data)
 
     @classmethod
-    def on_output_data(cls, data: bytes):
-        async def on_output_data_async(data: bytes):
-            return await open_xiaoai_server.on_output_data(data)
+    def __on_input_data_threadsafe(cls, data: bytes):
+        # 单事件循环模式：把录音数据交给事件循环处理
+        cls.async_loop.call_soon_threadsafe(GlobalStream.input, data)
 
-        asyncio.run_coroutine_threadsafe(
-            on_output_data_async(data),
-            cls.async_loop,
-        )
+    @classmethod
+    def on_output_data(cls, data: bytes):
+        # 交给输出调度器合并后匀速发送，不再为每一帧单独创建协程
+        if not cls.output_scheduler:
+            cls.output_scheduler = OutputScheduler.from_config(
+                open_xiaoai_server.on_output_data, cls.async_loop
+            )
+        cls.output_scheduler.write(data)
 
     @classmethod
     async def run_shell(cls, script: str, timeout: float = 10 * 1000):
@@ -85,9 +90,11 @@ class XiaoAI:
                 text = line.get("payload", {}).get("results")[0].get("text")
                 if not text and not line.get("payload", {}).get("is_vad_begin"):
                     print("🔥 唤醒小爱")
+                    Tracer.wake("xiaoai")
                     EventManager.on_interrupt()
                 elif text and line.get("payload", {}).get("is_final"):
                     print(f"🔥 收到指令: {text}")
+                    Tracer.wake("xiaoai")
                     await EventManager.wakeup(text, "xiaoai")
             if (
                 line
@@ -121,10 +128,22 @@ class XiaoAI:
         )
 
     @classmethod
-    async def init_xiaoai(cls):
+    async def init_xiaoai(cls, single_loop=False):
+        """
+        启动小爱音箱服务
+
+        参数:
+            single_loop: 是否复用当前事件循环（不再单独启动后台事件循环）
+        """
         GlobalStream.on_output_data = cls.on_output_data
-        open_xiaoai_server.register_fn("on_input_data", cls.on_input_data)
+        if single_loop:
+            cls.async_loop = asyncio.get_running_loop()
+            open_xiaoai_server.register_fn(
+                "on_input_data", cls.__on_input_data_threadsafe
+            )
+        else:
+            open_xiaoai_server.register_fn("on_input_data", cls.on_input_data)
+            cls.__init_background_event_loop()
         open_xiaoai_server.register_fn("on_event", cls.__on_event)
-        cls.__init_background_event_loop()
         print(ASCII_BANNER)
         await open_xiaoai_server.start_server()
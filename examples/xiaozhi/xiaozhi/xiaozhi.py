@@ -1,22 +1,28 @@
 import asyncio
+import itertools
 import json
 import re
 import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 
+from config import APP_CONFIG
 from xiaozhi.event import EventManager
 from xiaozhi.ref import set_xiaozhi
+from xiaozhi.services.audio.frontend import Frontend
 from xiaozhi.services.audio.kws import KWS
 from xiaozhi.services.audio.vad import VAD
 from xiaozhi.services.protocols.typing import (
     AbortReason,
     DeviceState,
-    EventType,
     ListeningMode,
 )
 from xiaozhi.services.protocols.websocket_protocol import WebsocketProtocol
 from xiaozhi.utils.base import get_env
 from xiaozhi.utils.config import ConfigManager
+from xiaozhi.utils.trace import Tracer
 from xiaozhi.xiaoai import XiaoAI
 
 
@@ -56,9 +62,24 @@ class XiaoZhi:
         self.loop_thread = None
         self.running = False
 
-        # 任务队列和锁
-        self.main_tasks = []
+        # 单事件循环模式（仅支持小爱音箱的音频输入输出）
+        runtime_config = APP_CONFIG.get("runtime", {})
+        self.single_loop = (
+            runtime_config.get("single_loop", False) and XiaoAI.mode == "xiaoai"
+        )
+        self.executor = None  # 模型推理线程池
+
+        # 任务队列和锁：主循环阻塞等待，有任务时立即唤醒
+        # 按 key 保存任务，相同 key 的任务只保留最新的一个
+        self.main_tasks: OrderedDict[object, Callable] = OrderedDict()
+        self.task_ids = itertools.count()  # 没有 key 的任务使用自增的序号
         self.mutex = threading.Lock()
+        self.task_ready = threading.Condition(self.mutex)
+        self.task_metrics = {
+            "scheduled": 0,  # 调度的任务数
+            "coalesced": 0,  # 被同 key 的新任务替换掉的任务数
+            "executed": 0,  # 实际执行的任务数
+        }
 
         # 协议实例
         self.protocol = None
@@ -66,11 +87,8 @@ class XiaoZhi:
         # 回调函数
         self.on_state_changed_callbacks = []
 
-        # 初始化事件对象
-        self.events = {
-            EventType.SCHEDULE_EVENT: threading.Event(),
-            EventType.AUDIO_INPUT_READY_EVENT: threading.Event(),
-        }
+        # 是否处于聆听状态（录音线程据此阻塞等待，无需轮询）
+        self.listening_event = threading.Event()
 
         # 创建显示界面
         self.display = None
@@ -87,17 +105,25 @@ class XiaoZhi:
         # 等待事件循环准备就绪
         time.sleep(0.1)
 
-        # 初始化应用程序
-        asyncio.run_coroutine_threadsafe(XiaoAI.init_xiaoai(), self.loop)
-        asyncio.run_coroutine_threadsafe(self._initialize_xiaozhi(), self.loop)
-
-        # 启动主循环线程
-        main_loop_thread = threading.Thread(target=self._main_loop)
-        main_loop_thread.daemon = True
-        main_loop_thread.start()
-
-        VAD.start()
-        KWS.start()
+        if self.single_loop:
+            self.running = True
+            asyncio.run_coroutine_threadsafe(self._run_single_loop(), self.loop)
+        else:
+            # 初始化应用程序
+            asyncio.run_coroutine_threadsafe(XiaoAI.init_xiaoai(), self.loop)
+            asyncio.run_coroutine_threadsafe(self._initialize_xiaozhi(), self.loop)
+
+            # 启动主循环线程
+            main_loop_thread = threading.Thread(target=self._main_loop)
+            main_loop_thread.daemon = True
+            main_loop_thread.start()
+
+            if Frontend.enabled:
+                # KWS 和 VAD 共用一个录音流和检测线程
+                Frontend.start()
+            else:
+                VAD.start()
+                KWS.start()
 
         # 启动 GUI
         self._initialize_display()
@@ -108,6 +134,26 @@ class XiaoZhi:
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
 
+    async def _run_single_loop(self):
+        """
+        单事件循环模式
+
+        录音输入、VAD、KWS、Opus 编码和发送都作为协程运行在 self.loop 上，
+        只有模型推理交给有界的线程池执行，减少线程切换和跨线程调度。
+        """
+        workers = APP_CONFIG.get("runtime", {}).get("inference_workers", 1)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="inference"
+        )
+
+        self.loop.create_task(XiaoAI.init_xiaoai(single_loop=True))
+        if Frontend.enabled:
+            Frontend.start_async(self.executor)
+        else:
+            VAD.start_async(self.executor)
+            KWS.start_async(self.executor)
+        await self._initialize_xiaozhi()
+
     async def _initialize_xiaozhi(self):
         """初始化应用程序组件"""
 
@@ -134,7 +180,12 @@ class XiaoZhi:
         except Exception as e:
             self.alert("错误", f"初始化音频设备失败: {e}")
 
-        threading.Thread(target=self._audio_input_event_trigger, daemon=True).start()
+        if self.single_loop:
+            self.loop.create_task(self._audio_input_task())
+        else:
+            threading.Thread(
+                target=self._audio_input_event_trigger, daemon=True
+            ).start()
 
     def _initialize_display(self):
         """初始化显示界面"""
@@ -156,7 +207,10 @@ class XiaoZhi:
             emotion_callback=self._get_current_emotion,
             mode_callback=self._on_mode_changed,
             auto_callback=self.toggle_chat_state,
-            abort_callback=lambda: self.abort_speaking(AbortReason.WAKE_WORD_DETECTED),
+            abort_callback=lambda: self.schedule(
+                lambda: self.abort_speaking(AbortReason.WAKE_WORD_DETECTED),
+                key="abort_speaking",
+            ),
         )
 
     def _main_loop(self):
@@ -164,51 +218,57 @@ class XiaoZhi:
         self.running = True
 
         while self.running:
-            # 等待事件
-            for event_type, event in self.events.items():
-                if event.is_set():
-                    event.clear()
+            self._process_scheduled_tasks()
 
-                    if event_type == EventType.AUDIO_INPUT_READY_EVENT:
-                        self._handle_input_audio()
-                    elif event_type == EventType.SCHEDULE_EVENT:
-                        self._process_scheduled_tasks()
-
-            time.sleep(0.01)
-
-    def _process_scheduled_tasks(self):
-        """处理调度任务"""
-        with self.mutex:
-            tasks = self.main_tasks.copy()
+    def _process_scheduled_tasks(self, timeout=1):
+        """阻塞等待调度任务并依次执行"""
+        with self.task_ready:
+            if not self.task_ready.wait_for(lambda: self.main_tasks, timeout):
+                return
+            tasks = list(self.main_tasks.values())
             self.main_tasks.clear()
+            self.task_metrics["executed"] += len(tasks)
 
         for task in tasks:
-            try:
-                task()
-            except Exception:
-                pass
+            self._run_task(task)
 
-    def schedule(self, callback):
-        """调度任务到主循环"""
+    def _run_task(self, task):
+        try:
+            task()
+        except Exception:
+            pass
+
+    def schedule(self, callback, key=None):
+        """
+        调度任务到主循环
+
+        参数:
+            callback: 任务
+            key: 合并任务的 key，队列中已有相同 key 的任务时用新任务替换它
+        """
         with self.mutex:
-            # 如果是中止语音的任务，检查是否已经存在相同类型的任务
-            if "abort_speaking" in str(callback):
-                # 如果已经有中止任务在队列中，就不再添加
-                if any("abort_speaking" in str(task) for task in self.main_tasks):
-                    return
-            self.main_tasks.append(callback)
-        self.events[EventType.SCHEDULE_EVENT].set()
-
-    def _handle_input_audio(self):
+            self.task_metrics["scheduled"] += 1
+            if key is None:
+                key = next(self.task_ids)
+            elif self.main_tasks.pop(key, None) is not None:
+                self.task_metrics["coalesced"] += 1
+            self.main_tasks[key] = callback
+            self.task_ready.notify()
+            wakeup = len(self.main_tasks) == 1
+
+        # 单事件循环模式：队列从空变为非空时安排一次执行
+        if self.single_loop and wakeup:
+            self.loop.call_soon_threadsafe(self._process_scheduled_tasks, 0)
+
+    def _handle_input_audio(self, timeout=0):
         """处理音频输入"""
         if self.device_state != DeviceState.LISTENING:
             return
 
-        encoded_data = self.audio_codec.read_audio()
-        if encoded_data and self.protocol and self.protocol.is_audio_channel_opened():
-            asyncio.run_coroutine_threadsafe(
-                self.protocol.send_audio(encoded_data), self.loop
-            )
+        encoded_data = self.audio_codec.read_audio(timeout=timeout)
+        if encoded_data and self.protocol:
+            # 放入协议的发送队列，由发送协程按顺序发出
+            self.protocol.queue_audio(encoded_data)
 
     def _on_network_error(self, message):
         """网络错误回调"""
@@ -224,6 +284,7 @@ class XiaoZhi:
 
     def _on_incoming_audio(self, data):
         """接收音频数据回调"""
+        Tracer.mark("first_audio")
         if self.device_state == DeviceState.SPEAKING:
             self.audio_codec.write_audio(data)
 
@@ -272,7 +333,11 @@ class XiaoZhi:
                         "VERIFICATION_CODE", verification_code.group(1)
                     )
 
-                self.schedule(lambda: self.set_chat_message("assistant", text))
+                # 按角色合并：助手的消息不会覆盖还没显示的用户消息
+                self.schedule(
+                    lambda: self.set_chat_message("assistant", text),
+                    key="set_chat_message:assistant",
+                )
 
     def _handle_tts_start(self):
         """处理TTS开始事件"""
@@ -289,26 +354,51 @@ class XiaoZhi:
     def _handle_stt_message(self, data):
         """处理STT消息"""
         text = data.get("text", "")
+        Tracer.mark("stt")
         if text:
             print(f"💬 我说：{text}")
-            self.schedule(lambda: self.set_chat_message("user", text))
+            self.schedule(
+                lambda: self.set_chat_message("user", text),
+                key="set_chat_message:user",
+            )
 
     def _handle_llm_message(self, data):
         """处理LLM消息"""
         emotion = data.get("emotion", "")
         if emotion:
-            self.schedule(lambda: self.set_emotion(emotion))
+            self.schedule(lambda: self.set_emotion(emotion), key="set_emotion")
 
     async def _on_audio_channel_opened(self):
         """音频通道打开回调"""
+        # 按服务端协商的参数配置下行音频
+        self.audio_codec.configure_output(
+            self.protocol.server_sample_rate, self.protocol.server_frame_duration
+        )
         self.set_device_state(DeviceState.IDLE)
 
     def _audio_input_event_trigger(self):
-        """音频输入事件触发器"""
+        """录音线程：由录音数据的到达驱动，没有定时轮询"""
         while self.running:
-            if self.audio_codec.input_stream.is_active():
-                self.events[EventType.AUDIO_INPUT_READY_EVENT].set()
-            time.sleep(0.01)
+            # 非聆听状态时阻塞等待
+            if not self.listening_event.wait(timeout=1):
+                continue
+            # 阻塞读取录音数据，数据到达时立即编码发送
+            self._handle_input_audio(timeout=0.1)
+
+    async def _audio_input_task(self):
+        """音频输入协程（单事件循环模式）"""
+        while self.running:
+            # 非聆听状态时录音流已停止，挂起到开始聆听
+            input_stream = self.audio_codec.input_stream
+            if not input_stream.is_active():
+                await input_stream.await_active()
+                continue
+
+            encoded_data = await self.audio_codec.aread_audio()
+            if self.device_state != DeviceState.LISTENING:
+                continue
+            if encoded_data and self.protocol.is_audio_channel_opened():
+                await self.protocol.send_audio(encoded_data)
 
     async def _on_audio_channel_closed(self):
         """音频通道关闭回调"""
@@ -318,8 +408,14 @@ class XiaoZhi:
     def set_device_state(self, state):
         """设置设备状态"""
         self.device_state = state
+        # 流式 VAD 模式下由 VAD 直接提供语音，不再单独读取录音流
+        if state == DeviceState.LISTENING and not VAD.streaming:
+            self.listening_event.set()
+        else:
+            self.listening_event.clear()
 
-        VAD.pause()  # 停用 VAD
+        if not (state == DeviceState.LISTENING and VAD.streaming):
+            VAD.pause()  # 停用 VAD
         self.audio_codec.stop_streams()  # 停用输入输出流
 
         if state == DeviceState.IDLE:
@@ -334,7 +430,7 @@ class XiaoZhi:
             if self.audio_codec.output_stream.is_active():
                 self.audio_codec.output_stream.stop_stream()
             # 打开输入流
-            if not self.audio_codec.input_stream.is_active():
+            if not VAD.streaming and not self.audio_codec.input_stream.is_active():
                 self.audio_codec.input_stream.start_stream()
         elif state == DeviceState.SPEAKING:
             self.display.update_status("说话中...")
@@ -460,6 +556,10 @@ class XiaoZhi:
         if self.audio_codec:
             self.audio_codec.close()
 
+        # 关闭模型推理线程池
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
         # 关闭协议
         if self.protocol:
             asyncio.run_coroutine_threadsafe(